@@ -1,35 +1,63 @@
+import asyncio
 import datetime as dt
 import logging
 import os
 
 import dotenv
-from telegram.ext import CommandHandler
-from telegram.ext import MessageHandler, Filters
-from telegram.ext import Updater
-
-from exact_time import extractor
+import pytz
+from telegram import Bot, Update
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from formatting import human_format
+from metrics import MetricsServer, SamplingProfiler
+from phrases import UnrecognizedPhrases
+from runtime import Runtime
+from scheduler import Reminder, Scheduler
+from sharding import ShardedScheduler
+from storage import ReminderStore
+from timezones import DEFAULT_TIMEZONE, zone_table
+from webhook import WebhookServer
 
 dotenv.load_dotenv(dotenv.find_dotenv())
 
+# LOG_LEVEL=DEBUG также включает трассировку разбора в exact_time.
 logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 
 logger = logging.getLogger(__name__)
 
-updater = Updater(token=os.environ["TOKEN"])
-dispatcher = updater.dispatcher
+PAGE_SIZE = 20
+# Сообщение Bot API — не больше 4096 символов. Фразы хранятся до 200 символов,
+# и 20 таких не влезают в страницу: в списке их начало, остальное — до 50 символов
+# на счётчик, перевод строки и заголовок.
+MESSAGE_LIMIT = 4096
+PHRASE_LENGTH = MESSAGE_LIMIT // PAGE_SIZE - 50
+DEFAULT_ZONE = os.environ.get("DEFAULT_TIMEZONE", DEFAULT_TIMEZONE)
+
+unrecognized_phrases = None
+runtime = None
+store = None
+scheduler = None
 
 
-unrecognized_phrases = set()
+def send_reminder(reminder):
+    # Сработавшие разом напоминания одного чата уходят одним сообщением.
+    runtime.send_message_threadsafe(
+        chat_id=reminder.chat_id, text=f"Напоминаю: {reminder.task}", coalesce=True
+    )
 
 
-def error(bot, update, error):
-    logger.warning('Update "%s" caused error "%s"' % (update, error))
+def is_retryable(error):
+    # BadRequest тоже NetworkError, но повтор его не исправит.
+    if isinstance(error, BadRequest):
+        return False
+    return isinstance(error, (NetworkError, RetryAfter))
 
 
-def start(bot, update):
-    bot.send_message(
+async def start(runtime, update):
+    await runtime.send_message(
         chat_id=update.message.chat_id,
         text="""
         Привет! Я напоминалка! Напиши мне, о чём тебе стоит напомнить простой строкой, например,
@@ -38,100 +66,194 @@ def start(bot, update):
     )
 
 
-def is_today(moment):
-    return dt.datetime.today().date() == moment.date()
-
+async def chat_zone(runtime, chat_id):
+    timezone = await runtime.call(store.get_timezone, chat_id)
+    return zone_table(timezone or DEFAULT_ZONE)
 
-def is_tomorrow(moment):
-    return dt.datetime.today().date() + dt.timedelta(days=1) == moment.date()
 
+async def print_exact_time(runtime, update):
+    # Разбираем в местном времени чата, планируем в UTC.
+    zone = await chat_zone(runtime, update.message.chat_id)
+    now = zone.from_utc(dt.datetime.utcnow())
+    extract = await runtime.parse(update.message.text, now)
 
-def is_day_after_tomorrow(moment):
-    return dt.datetime.today().date() + dt.timedelta(days=2) == moment.date()
-
+    if extract is None:
+        unrecognized_phrases.add(update.message.text)
+        text = "Я ничего не поняла."
+    elif extract.past:
+        text = f"""
+        {extract.time.strftime('%Y-%m-%d %H:%M')} уже прошло, напомнить не получится.
+        """
+    else:
+        reminder = Reminder(
+            zone.to_utc(extract.time),
+            update.message.chat_id,
+            extract.task,
+            rule=extract.rule,
+            timezone=zone.name,
+        )
+        await runtime.call(scheduler.add, reminder)
+        when = human_format(extract.time, now)
+        if extract.rule:
+            when += ", и дальше по расписанию"
+        text = f"""
+        "{extract.task}" — напомню {when} ({extract.time.strftime('%Y-%m-%d %H:%M')})
+        """
 
-def is_on_this_week(moment):
-    start = moment - dt.timedelta(days=moment.weekday())
-    return start <= moment <= start + dt.timedelta(days=7)
+    await runtime.send_message(chat_id=update.message.chat_id, text=text)
 
 
-def human_format_dayofweek(moment):
-    return moment.strftime("%A")
+def shorten(text, length):
+    return text if len(text) <= length else text[: length - 1] + "…"
 
 
-def human_format_date(moment):
-    return moment.strftime("%d %B %Y")
+def format_phrases_page(phrases, number):
+    pages = max(-(-len(phrases) // PAGE_SIZE), 1)
+    rows = phrases.page(number, PAGE_SIZE)
+    if not rows:
+        return f"Страница {number} пуста, всего страниц: {pages}."
 
+    # error > 0 — фраза вытеснила другую и её счётчик завышен не больше чем на error.
+    lines = [
+        f"{'≈' if error else ''}{count} — {shorten(phrase, PHRASE_LENGTH)}"
+        for phrase, count, error in rows
+    ]
+    return f"Страница {number} из {pages}:\n" + "\n".join(lines)
 
-def human_format(moment):
-    if moment.minute:
-        time = f"в {moment.hour}:{moment.minute}"
-    else:
-        time = f"в {moment.hour}"
-
-    if is_today(moment):
-        date = "сегодня"
-    elif is_tomorrow(moment):
-        date = "завтра"
-    elif is_day_after_tomorrow(moment):
-        date = f"послезавтра ({human_format_dayofweek(moment)})"
-    elif is_on_this_week(moment):
-        date = f"в эту {human_format_dayofweek(moment)}"
-    else:
-        date = human_format_date(moment)
 
-    return f"{date} {time}"
+async def print_unrecognized_phrases(runtime, update):
+    # /print [страница]
+    argument = update.message.text.split(" ", 1)[1:]
+    number = int(argument[0]) if argument and argument[0].strip().isdigit() else 1
+    text = format_phrases_page(unrecognized_phrases, max(number, 1))
+    await runtime.send_message(chat_id=update.message.chat_id, text=text)
 
 
-def print_exact_time(bot, update):
-    global unrecognized_phrases
-    extract = extractor(update.message.text)
-
-    if extract is None:
-        unrecognized_phrases.add(update.message.text)
-        text = "Я ничего не поняла."
+async def print_timezone(runtime, update):
+    # /timezone — показать зону чата, /timezone Europe/Samara — сменить.
+    chat_id = update.message.chat_id
+    argument = update.message.text.split(" ", 1)[1:]
+    if argument and argument[0].strip():
+        name = argument[0].strip()
+        try:
+            zone = zone_table(name)
+        except pytz.UnknownTimeZoneError:
+            text = f"Не знаю часовой пояс {name}. Пример: /timezone Europe/Moscow"
+            await runtime.send_message(chat_id=chat_id, text=text)
+            return
+        await runtime.call(store.set_timezone, chat_id, zone.name)
     else:
-        when = human_format(extract.time)
-        text = f"""
-        "{extract.task}" — напомню {when} ({extract.time.strftime('%Y-%m-%d %H:%M')})
-        """
-
-    bot.send_message(chat_id=update.message.chat_id, text=text)
+        zone = await chat_zone(runtime, chat_id)
 
+    now = zone.from_utc(dt.datetime.utcnow())
+    text = f"Часовой пояс: {zone.name}, сейчас {now.strftime('%H:%M')}"
+    await runtime.send_message(chat_id=chat_id, text=text)
 
-def print_unrecognized_phrases(bot, update):
-    global unrecognized_phrases
-    text = ", ".join(unrecognized_phrases)
-    bot.send_message(chat_id=update.message.chat_id, text=text)
 
+async def unknown(runtime, update):
+    await runtime.send_message(
+        chat_id=update.message.chat_id, text="Sorry, I didn't understand that command."
+    )
 
-def print_timezone(bot, update):
-    tz = dt.datetime.now(dt.timezone.utc).astimezone().tzname()
-    bot.send_message(chat_id=update.message.chat_id, text=tz)
 
+commands = {
+    "print": print_unrecognized_phrases,
+    "timezone": print_timezone,
+    "start": start,
+}
 
-def unknown(bot, update):
-    bot.send_message(
-        chat_id=update.message.chat_id, text="Sorry, I didn't understand that command."
-    )
 
+def route(update):
+    message = update.message
+    if message is None or not message.text:
+        return
 
-exact_time_handler = MessageHandler(Filters.text, print_exact_time)
-dispatcher.add_handler(exact_time_handler)
+    if not message.text.startswith("/"):
+        return print_exact_time
 
-unrecognized_handler = CommandHandler("print", print_unrecognized_phrases)
-dispatcher.add_handler(unrecognized_handler)
+    # /command@botname arguments
+    command = message.text[1:].split(" ", 1)[0].split("@")[0]
+    return commands.get(command, unknown)
 
-tz_handler = CommandHandler("timezone", print_timezone)
-dispatcher.add_handler(tz_handler)
 
-start_handler = CommandHandler("start", start)
-dispatcher.add_handler(start_handler)
+def main():
+    global runtime, store, scheduler, unrecognized_phrases
 
-unknown_handler = MessageHandler(Filters.command, unknown)
-dispatcher.add_handler(unknown_handler)
+    bot = Bot(token=os.environ["TOKEN"])
+    runtime = Runtime(
+        bot,
+        route,
+        workers=int(os.environ.get("WORKERS", 16)),
+        parse_processes=int(os.environ.get("PARSE_PROCESSES", os.cpu_count() or 1)),
+        send_options={"retryable": is_retryable},
+    )
+    database = os.environ.get("DATABASE", "reminders.sqlite3")
+    store = ReminderStore(database)
+    unrecognized_phrases = UnrecognizedPhrases(database)
+    # SHARDS > 1 — напоминания распределяются по процессам-шардам со своими базами,
+    # в основной базе остаются часовые пояса чатов и нераспознанные фразы.
+    shards = int(os.environ.get("SHARDS", 1))
+    if shards > 1:
+        path_template = os.path.splitext(database)[0] + ".shard{}.sqlite3"
+        scheduler = ShardedScheduler(send_reminder, path_template, shards=shards)
+    else:
+        scheduler = Scheduler(send_reminder, clock=dt.datetime.utcnow, store=store)
+
+    try:
+        asyncio.get_event_loop().run_until_complete(runtime_main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        store.close()
+        unrecognized_phrases.close()
+
+
+async def runtime_main():
+    await runtime.start()
+    scheduler.start()
+
+    # METRICS_PORT — /metrics для Prometheus на localhost; PROFILER=1 — ещё и /profile.
+    metrics_server = None
+    if os.environ.get("METRICS_PORT"):
+        profiler = SamplingProfiler() if os.environ.get("PROFILER") == "1" else None
+        metrics_server = MetricsServer(
+            profiler=profiler,
+            host=os.environ.get("METRICS_HOST", "127.0.0.1"),
+            port=int(os.environ["METRICS_PORT"]),
+        )
+        await metrics_server.start()
+
+    try:
+        # WEBHOOK_URL задан — получаем обновления через вебхук, иначе long polling.
+        webhook_url = os.environ.get("WEBHOOK_URL")
+        if webhook_url:
+            await serve_webhook(webhook_url)
+        else:
+            await runtime.call(runtime.bot.delete_webhook)
+            await runtime.poll()
+    finally:
+        if metrics_server:
+            await metrics_server.stop()
+        await runtime.shutdown()
+
+
+async def serve_webhook(webhook_url):
+    bot = runtime.bot
+    server = WebhookServer(
+        runtime,
+        lambda data: Update.de_json(data, bot),
+        path=os.environ.get("WEBHOOK_PATH", f"/{bot.token}"),
+        host=os.environ.get("WEBHOOK_HOST", "0.0.0.0"),
+        port=int(os.environ.get("WEBHOOK_PORT", 8443)),
+    )
+    await server.start()
+    await runtime.call(bot.set_webhook, url=webhook_url)
+    try:
+        await runtime.wait_stopped()
+    finally:
+        await server.stop()
 
-dispatcher.add_error_handler(error)
 
-updater.start_polling()
-updater.idle()
+if __name__ == "__main__":
+    main()
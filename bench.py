@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import datetime as dt
+import json
+import logging
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+from collections import defaultdict
+
+from cases import cases
+from exact_time import (
+    DayEnum,
+    Recurrence,
+    extract_many,
+    extractor,
+    get_parser,
+    logger,
+    morph_cache,
+    may_contain_time,
+    parse,
+    parse_cache,
+)
+
+MOMENT = dt.datetime(2018, 1, 1, 12, 0)
+REPEAT = 20
+TOLERANCE = 0.25
+# p99 правила с меньшим числом фраз в корпусе — по сути максимум, сплошной шум.
+MIN_P99_COUNT = 10
+
+# Метрики, где больше — лучше; остальные (время, память) должны не расти.
+HIGHER_IS_BETTER = ("throughput", "hit_rate")
+
+
+def run(strings, repeat=REPEAT, cached=False):
+    """Return mean extractor time per message, in microseconds."""
+    for string in strings:
+        extractor(string, moment=MOMENT)  # warm up morph caches
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        if not cached:
+            parse_cache.clear()
+        for string in strings:
+            extractor(string, moment=MOMENT)
+    elapsed = time.perf_counter() - started
+
+    return elapsed / (repeat * len(strings)) * 1e6
+
+
+def corpus() -> list:
+    """cases.py and the phrases from the extractor test fixtures."""
+    from tests.test_recurrence import cases as recurrence_cases
+    from tests.test_times import cases as time_cases
+
+    return (
+        cases
+        + [case for case, _, _ in time_cases]
+        + [case for case, _, _ in recurrence_cases]
+    )
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def rule_name(string, extract):
+    if not may_contain_time(string):
+        return "prefiltered"
+    if extract is None:
+        return "no_match"
+    return extract.alternative or "unknown"
+
+
+def run_rules(strings, repeat=REPEAT) -> dict:
+    """Return cold extractor latency (us) and throughput (messages/s) per matched rule."""
+    samples = defaultdict(list)
+    for string in strings:
+        extractor(string, moment=MOMENT)  # warm up morph caches
+
+    for _ in range(repeat):
+        for string in strings:
+            # В корпусе есть повторы: без очистки повтор измерял бы попадание в кеш.
+            parse_cache.clear()
+            started = time.perf_counter()
+            extract = extractor(string, moment=MOMENT)
+            elapsed = time.perf_counter() - started
+            samples[rule_name(string, extract)].append(elapsed)
+            samples["total"].append(elapsed)
+
+    return {
+        rule: {
+            "count": len(values) // repeat,
+            "throughput": len(values) / sum(values),
+            "p50": percentile(values, 0.5) * 1e6,
+            "p99": percentile(values, 0.99) * 1e6,
+        }
+        for rule, values in samples.items()
+    }
+
+
+def resolve(fact):
+    if isinstance(fact, Recurrence):
+        return fact.get_rrule(MOMENT).after(MOMENT)
+    return fact.get_datetime(MOMENT)
+
+
+def best_time(func, arg, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_breakdown(strings) -> dict:
+    """Return mean time per message (us) of each extraction stage.
+
+    Stages are timed cumulatively and subtracted: parser.findall tokenizes,
+    and parse() runs findall and then interprets the match into a fact.
+    """
+    parser = get_parser()
+    stages = dict.fromkeys(["tokenize", "parse", "interpret", "get_datetime"], 0.0)
+    strings = [string for string in strings if may_contain_time(string)]
+    for string in strings:
+        tokenize = best_time(lambda string: list(parser.tokenizer(string)), string)
+        findall = best_time(lambda string: list(parser.findall(string)), string)
+        interpret = best_time(parse, string)
+        stages["tokenize"] += tokenize
+        stages["parse"] += max(findall - tokenize, 0)
+        stages["interpret"] += max(interpret - findall, 0)
+
+        parsed = parse(string)
+        if parsed is not None:
+            stages["get_datetime"] += best_time(resolve, parsed.fact)
+
+    return {stage: total / len(strings) * 1e6 for stage, total in stages.items()}
+
+
+def run_memory(strings) -> float:
+    """Return peak memory allocated while extracting strings (cold cache), in KiB."""
+    parse_cache.clear()
+    tracemalloc.start()
+    try:
+        for string in strings:
+            extractor(string, moment=MOMENT)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def measure(strings, repeat=REPEAT) -> dict:
+    """Return flat pipeline metrics, e.g. {"rule.DAY_AT_TIME.p99": ...}."""
+    metrics = {}
+    morph_cache.clear()
+    for rule, stats in run_rules(strings, repeat).items():
+        for name, value in stats.items():
+            metrics[f"rule.{rule}.{name}"] = value
+    metrics["cache.morph.hit_rate"] = morph_cache.stats()["hit_rate"]
+    for stage, value in run_breakdown(strings).items():
+        metrics[f"stage.{stage}"] = value
+    metrics["memory.peak_kib"] = run_memory(strings)
+    return metrics
+
+
+def compare(metrics, baseline, tolerance=TOLERANCE) -> list:
+    """Return descriptions of metrics that regressed by more than tolerance."""
+    regressions = []
+    for name, old in sorted(baseline.items()):
+        new = metrics.get(name)
+        if new is None or name.endswith(".count") or not old:
+            continue
+        if name.endswith(".p99") and baseline.get(f"{name[:-4]}.count", 0) < MIN_P99_COUNT:
+            continue
+        if name.endswith(HIGHER_IS_BETTER):
+            change = old / new - 1 if new else float("inf")
+        else:
+            change = new / old - 1
+        if change > tolerance:
+            regressions.append(f"{name}: {old:.1f} -> {new:.1f} ({change:+.0%} worse)")
+    return regressions
+
+
+def print_metrics(metrics):
+    rules = sorted({name.split(".")[1] for name in metrics if name.startswith("rule.")})
+    print(f"{'rule':<24}{'count':>7}{'msg/s':>10}{'p50 us':>10}{'p99 us':>10}")
+    for rule in rules:
+        row = [metrics[f"rule.{rule}.{name}"] for name in ("count", "throughput", "p50", "p99")]
+        print(f"{rule:<24}{row[0]:>7}{row[1]:>10.0f}{row[2]:>10.1f}{row[3]:>10.1f}")
+
+    stages = {name[6:]: value for name, value in metrics.items() if name.startswith("stage.")}
+    total = sum(stages.values())
+    print(" ".join(f"{stage}: {value:.1f} us ({value / total:.0%})" for stage, value in stages.items()))
+    print(f"peak memory: {metrics['memory.peak_kib']:.0f} KiB")
+    print(f"morph cache hit rate: {metrics['cache.morph.hit_rate']:.1%}")
+
+
+def run_many(strings, processes=None):
+    """Return extract_many throughput in messages per second (cold parse cache)."""
+    parse_cache.clear()
+    started = time.perf_counter()
+    for _ in extract_many(strings, MOMENT, processes=processes):
+        pass
+    elapsed = time.perf_counter() - started
+
+    return len(strings) / elapsed
+
+
+def run_trace_point(number=1000000):
+    """Return the cost of one disabled extractor trace point, in nanoseconds."""
+    assert not logger.isEnabledFor(logging.DEBUG)
+    elapsed = timeit.timeit(lambda: logger.isEnabledFor(logging.DEBUG), number=number)
+    return elapsed / number * 1e9
+
+
+def run_get_date(number=100000):
+    """Return the cost of resolving a weekday with DayEnum.get_date, in microseconds."""
+    elapsed = timeit.timeit(lambda: DayEnum.FRIDAY.get_date(MOMENT), number=number)
+    return elapsed / number * 1e6
+
+
+def run_runtime(messages=1000, chats=100):
+    """Return end-to-end replies per second through Runtime and a local fake Bot API."""
+    from telegram import Bot
+
+    import app
+    from fake_telegram import FakeTelegram
+    from phrases import UnrecognizedPhrases
+    from runtime import Runtime
+    from scheduler import Scheduler
+    from storage import ReminderStore
+
+    fake = FakeTelegram().start()
+    app.scheduler = Scheduler(lambda reminder: None)
+    app.store = ReminderStore(":memory:")
+    app.unrecognized_phrases = UnrecognizedPhrases(":memory:")
+    app.runtime = runtime = Runtime(
+        Bot(fake.token, base_url=fake.base_url),
+        app.route,
+        parse_processes=os.cpu_count(),
+        poll_timeout=1,
+        # Меряем сам рантайм, а не лимиты Bot API.
+        send_options={"global_rate": 1e6, "chat_rate": 1e6},
+    )
+    for index in range(messages):
+        fake.push(index % chats, cases[index % len(cases)])
+
+    async def main():
+        await runtime.start()
+        poll = asyncio.ensure_future(runtime.poll())
+        started = time.perf_counter()
+        await runtime.loop.run_in_executor(None, fake.wait_sent, messages, 120)
+        elapsed = time.perf_counter() - started
+        runtime.stop()
+        await poll
+        await runtime.shutdown()
+        return elapsed
+
+    elapsed = asyncio.get_event_loop().run_until_complete(main())
+    fake.stop()
+    return len(fake.sent) / elapsed
+
+
+def run_other():
+    print(f"cases.py: {len(cases)} messages, {run(cases):.1f} us/message")
+    print(f"cases.py, warm parse cache: {run(cases, cached=True):.1f} us/message")
+
+    history = [f"{case} #{index}" for index in range(10) for case in cases]
+    for processes in (None, os.cpu_count()):
+        print(f"extract_many, processes={processes}: {run_many(history, processes):.0f} messages/s")
+    print(f"disabled trace point: {run_trace_point():.0f} ns")
+    print(f"DayEnum.get_date: {run_get_date():.2f} us")
+    try:
+        print(f"runtime + fake Bot API: {run_runtime():.0f} replies/s")
+    except ImportError as error:
+        print(f"runtime benchmark skipped: {error}")
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Extraction pipeline benchmark.")
+    arguments.add_argument("--save", metavar="FILE", help="save metrics as a baseline")
+    arguments.add_argument("--compare", metavar="FILE", help="fail on regressions against FILE")
+    arguments.add_argument("--tolerance", type=float, default=TOLERANCE)
+    arguments.add_argument("--repeat", type=int, default=REPEAT)
+    arguments.add_argument("--all", action="store_true", help="also run the other benchmarks")
+    args = arguments.parse_args(argv)
+
+    metrics = measure(corpus(), args.repeat)
+    print_metrics(metrics)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(metrics, file, indent=2, sort_keys=True)
+
+    if args.all:
+        run_other()
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(metrics, json.load(file), args.tolerance)
+        if regressions:
+            print(f"REGRESSIONS against {args.compare}:", *regressions, sep="\n  ")
+            return 1
+        print(f"no regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
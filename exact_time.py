@@ -1,12 +1,24 @@
 import datetime as dt
 import enum
-from collections import namedtuple
-from typing import Optional
+import functools
+import itertools
+import logging
+import multiprocessing
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Iterable, Iterator, Optional
 
 from dateutil import rrule
+from dateutil.relativedelta import relativedelta
+from pymorphy2 import MorphAnalyzer
 from yargy import rule, and_, or_, Parser
 from yargy.interpretation import fact
-from yargy.predicates import gte, lte, normalized, dictionary, caseless
+from yargy.morph import MorphAnalyzer as YargyMorphAnalyzer
+from yargy.tokenizer import MorphTokenizer
+from yargy.predicates import gte, lte, normalized, caseless, in_caseless
+
+from vocabulary import VocabularyTagger, vocabulary
 
 Hour = fact("Hour", ["hour"])  # get_time
 Minute = fact("Minute", ["minute"])  # get_time
@@ -14,9 +26,17 @@ HourAndMinute = fact("HourAndMinute", ["hour", "minute"])  # get_time
 Time = fact("Time", ["time"])  # get_time
 TimeOfDay = fact("TimeOfDay", ["time"])  # get_time
 AtTime = fact("AtTime", ["time", "time_of_day", "day"])
-DeltaTime = fact("DeltaTime", ["years", "months", "weeks", "days", "minutes", "seconds"])
+PastHour = fact("PastHour", ["minute", "hour"])  # get_time
+DeltaTime = fact(
+    "DeltaTime", ["years", "months", "weeks", "days", "hours", "minutes", "seconds"]
+)
+Amount = fact("Amount", ["value"])
 Date = fact("Date", ["year", "month", "day"])
 DayName = fact("DayName", ["name"])
+Recurrence = fact(
+    "Recurrence",
+    ["interval", "frequency", "weekday", "month_day", "month", "time", "time_of_day"],
+)
 
 
 def to_int(value):
@@ -27,7 +47,8 @@ def to_int(value):
 
 class Hour(Hour):
     def get_time(self):
-        return dt.time(self.hour, 0)
+        # 24 часа — полночь, следующий день добавляет AtTime.
+        return dt.time(self.hour % 24, 0)
 
 
 class Minute(Minute):
@@ -37,23 +58,32 @@ class Minute(Minute):
 
 class HourAndMinute(HourAndMinute):
     def get_time(self):
-        return dt.time(self.hour.hour, self.minute.minute)
+        return dt.time(self.hour.hour % 24, self.minute.minute)
+
+
+class PastHour(PastHour):
+    def get_time(self):
+        # 10 минут второго -> 1:10, пол второго -> 1:30, пол первого -> 12:30
+        minute = 30 if self.minute is None else self.minute
+        return dt.time((self.hour - 1) or 12, minute)
 
 
 class Time(Time):
     def get_time(self):
         return self.time.get_time()
 
+    @property
+    def next_day(self) -> bool:
+        # в 24:00 — полночь в конце дня
+        hour = getattr(self.time, "hour", None)
+        return getattr(hour, "hour", hour) == 24
+
 
 class Date(Date):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if not self.year:
-            self.year = dt.datetime.today().year + 1
-
     def get_date(self, current):
+        # Без года — следующий год относительно момента разбора.
         return dt.date(
-            self.year or current.year, self.month or current.month, self.day or current.day
+            self.year or current.year + 1, self.month or current.month, self.day or current.day
         )
 
 
@@ -67,6 +97,8 @@ class AtTime(AtTime):
 
         if self.day:
             date = self.day.get_date(current)
+            if self.time and self.time.next_day:
+                date += dt.timedelta(days=1)
 
         time = self.prepare_time(time)
 
@@ -74,7 +106,11 @@ class AtTime(AtTime):
 
     def postprocess(self, current, result):
         if current >= result:
-            if (current - result).seconds < 60 * 60 * 24:
+            if (current - result).total_seconds() < 60 * 60 * 24:
+
+                # Вечерние часы (13-23) сдвигать некуда: только на следующий день.
+                if result.hour not in hours_map_after:
+                    return result + dt.timedelta(days=1)
 
                 shifted_result = result.replace(hour=hours_map_after[result.hour])
 
@@ -83,7 +119,7 @@ class AtTime(AtTime):
                     return shifted_result
 
                 # Time of day specified and it contains shifted hour.
-                elif self.time_of_day.contains(shifted_result.hour):
+                elif self.time_of_day and self.time_of_day.contains(shifted_result.hour):
                     return shifted_result
 
                 # Shift one day forward.
@@ -106,10 +142,71 @@ class AtTime(AtTime):
         return dt.time(9, 0)
 
 
+class Amount(Amount):
+    def get_value(self) -> int:
+        # через час, через неделю: без числа — одна единица.
+        if self.value is None:
+            return 1
+        return self.value
+
+
 class DeltaTime(DeltaTime):
+    UNITS = ["years", "months", "weeks", "days", "hours", "minutes", "seconds"]
+
+    def get_delta(self) -> relativedelta:
+        return relativedelta(
+            **{unit: getattr(self, unit).get_value() for unit in self.UNITS if getattr(self, unit)}
+        )
+
+    def get_datetime(self, current) -> dt.datetime:
+        return current + self.get_delta()
+
+
+class Recurrence(Recurrence):
+    def get_rrule(self, current) -> rrule.rrule:
+        """Return the rule; occurrences are expanded lazily by the caller."""
+        frequency = self.frequency
+        kwargs = {}
+
+        if self.weekday:
+            frequency = rrule.WEEKLY
+            kwargs["byweekday"] = rrule.weekdays[self.weekday - 1]
+        elif self.month:
+            frequency = rrule.YEARLY
+            kwargs.update(bymonth=self.month, bymonthday=self.month_day)
+        elif self.month_day:
+            frequency = rrule.MONTHLY
+            kwargs["bymonthday"] = self.month_day
+        elif frequency is None:
+            # каждое утро
+            frequency = rrule.DAILY
+
+        # каждые 10 минут, каждый час: отсчёт от текущего момента.
+        if frequency not in (rrule.MINUTELY, rrule.HOURLY) or self.time:
+            time = self.get_time()
+            kwargs.update(byhour=time.hour, byminute=time.minute, bysecond=0)
+
+        return rrule.rrule(
+            frequency,
+            interval=self.interval or 1,
+            dtstart=current.replace(second=0, microsecond=0),
+            **kwargs,
+        )
+
+    def get_time(self) -> dt.time:
+        if self.time:
+            time = self.time.get_time()
+        elif self.time_of_day:
+            time = self.time_of_day.default_time()
+        else:
+            time = dt.time(9, 0)
+
+        if self.time_of_day:
+            time = time.replace(hour=self.time_of_day.prepare_hour(time.hour))
+        return time
 
     def get_datetime(self, current) -> dt.datetime:
-        return dt.datetime.combine(current, dt.time(current.hour, self.minutes.minute))
+        return self.get_rrule(current).after(current)
 
 
 MONTHS = {
@@ -184,6 +281,7 @@ class TimeOfDayEnum(enum.Enum):
         # 10 дня -> 10:00, 20 дня -> 20:00
         # 10 вечера -> 22:00, 2 вечера -> 2:00
         # 22 ночи -> 22:00, 10 ночи -> 22:00
+        # 16 вечера -> 16:00, 24 вечера -> 0:00: дневные часы не сдвигаются
 
         if self.contains(hour):
             return hour
@@ -192,11 +290,11 @@ class TimeOfDayEnum(enum.Enum):
             return hour
 
         if self == self.DAY:
-            return hours_map_after[hour]
+            return hours_map_after.get(hour, hour)
 
         if self == self.EVENING:
             if self.after(hour):
-                return hours_map_after[hour]
+                return hours_map_after.get(hour, hour)
 
             if self.before(hour):
                 return hour
@@ -206,7 +304,7 @@ class TimeOfDayEnum(enum.Enum):
                 return hour
 
             if self.before(hour):
-                return hours_map_after[hour]
+                return hours_map_after.get(hour, hour)
 
         raise NotImplementedError
 
@@ -246,19 +344,10 @@ class DayEnum(enum.IntEnum):
     TODAY = 10
 
     def get_date(self, current):
-        # Day of week
+        # Day of week: ближайший такой день после текущего, тот же день — через неделю.
         if self.value <= self.SUNDAY:
-            r_rule = iter(
-                rrule.rrule(
-                    rrule.DAILY, dtstart=current, byweekday=rrule.weekdays[self.value - 1], count=2
-                )
-            )
-            next_date = next(r_rule)
-
-            if next_date.date() == current.date():
-                return next(r_rule)
-
-            return next_date
+            days = (self.value - current.isoweekday()) % 7 or 7
+            return current + dt.timedelta(days=days)
 
         if self.value == self.TOMORROW:
             return current + dt.timedelta(days=1)
@@ -284,6 +373,140 @@ TIMES_OF_DAY = {
 }
 
 
+NUMBER_WORDS = {
+    "один": 1,
+    "два": 2,
+    "три": 3,
+    "четыре": 4,
+    "пять": 5,
+    "шесть": 6,
+    "семь": 7,
+    "восемь": 8,
+    "девять": 9,
+    "десять": 10,
+    "одиннадцать": 11,
+    "двенадцать": 12,
+    "тринадцать": 13,
+    "четырнадцать": 14,
+    "пятнадцать": 15,
+    "шестнадцать": 16,
+    "семнадцать": 17,
+    "восемнадцать": 18,
+    "девятнадцать": 19,
+    "двадцать": 20,
+    "тридцать": 30,
+    "сорок": 40,
+    "пятьдесят": 50,
+}
+UNITS = ["один", "два", "три", "четыре", "пять", "шесть", "семь", "восемь", "девять"]
+# Составные числительные: ключ — нормальные формы слов через пробел, «двадцать пять».
+NUMBER_WORDS.update(
+    {
+        f"{tens} {unit}": NUMBER_WORDS[tens] + NUMBER_WORDS[unit]
+        for tens in ["двадцать", "тридцать", "сорок", "пятьдесят"]
+        for unit in UNITS
+    }
+)
+
+# Время словами: «в шесть», «в одиннадцать тридцать». Только в именительном
+# падеже, без склонения: «в одном магазине» — не время.
+CLOCK_MINUTES = NUMBER_WORDS
+CLOCK_HOURS = {key: value for key, value in NUMBER_WORDS.items() if value <= 24}
+
+ORDINAL_WORDS = {
+    "первый": 1,
+    "второй": 2,
+    "третий": 3,
+    "четвёртый": 4,
+    "пятый": 5,
+    "шестой": 6,
+    "седьмой": 7,
+    "восьмой": 8,
+    "девятый": 9,
+    "десятый": 10,
+    "одиннадцатый": 11,
+    "двенадцатый": 12,
+    "тринадцатый": 13,
+    "четырнадцатый": 14,
+    "пятнадцатый": 15,
+    "шестнадцатый": 16,
+    "семнадцатый": 17,
+    "восемнадцатый": 18,
+    "девятнадцатый": 19,
+    "двадцатый": 20,
+    "тридцатый": 30,
+}
+# седьмого мая, двадцать пятого декабря, тридцать первое
+DAY_ORDINALS = dict(ORDINAL_WORDS)
+DAY_ORDINALS.update(
+    {f"двадцать {word}": 20 + value for word, value in ORDINAL_WORDS.items() if value < 10}
+)
+DAY_ORDINALS["тридцать первый"] = 31
+
+# Следующий час в родительном падеже: пол второго, 10 минут второго -> 1:30, 1:10.
+NEXT_HOURS = {
+    "первого": 1,
+    "второго": 2,
+    "третьего": 3,
+    "четвёртого": 4,
+    "пятого": 5,
+    "шестого": 6,
+    "седьмого": 7,
+    "восьмого": 8,
+    "девятого": 9,
+    "десятого": 10,
+    "одиннадцатого": 11,
+    "двенадцатого": 12,
+}
+HALF_HOURS = {f"пол{word}": value for word, value in NEXT_HOURS.items()}
+
+# Для повторяющихся напоминаний: "каждый день" — это частота, а не время дня.
+RECURRING_TIMES_OF_DAY = {
+    key: value for key, value in TIMES_OF_DAY.items() if value != TimeOfDayEnum.DAY
+}
+
+WEEKDAYS = {key: value for key, value in DAYS.items() if value <= DayEnum.SUNDAY}
+
+EVERY_WORDS = {"каждый"}
+
+ORDINALS = {
+    "второй": 2,
+    "третий": 3,
+    "четвёртый": 4,
+    "пятый": 5,
+}
+
+FREQUENCIES = {
+    "минута": rrule.MINUTELY,
+    "час": rrule.HOURLY,
+    "день": rrule.DAILY,
+    "неделя": rrule.WEEKLY,
+    "месяц": rrule.MONTHLY,
+    "год": rrule.YEARLY,
+}
+
+
+# Словари грамматики: формы слов размечает VocabularyTagger, правила читают
+# разметку предикатом vocabulary(имя). Словари VERBATIM_VOCABULARIES не склоняются.
+VOCABULARIES = {
+    "MONTHS": MONTHS,
+    "DAYS": DAYS,
+    "TIMES_OF_DAY": TIMES_OF_DAY,
+    "NUMBER_WORDS": NUMBER_WORDS,
+    "RECURRING_TIMES_OF_DAY": RECURRING_TIMES_OF_DAY,
+    "WEEKDAYS": WEEKDAYS,
+    "EVERY_WORDS": EVERY_WORDS,
+    "ORDINALS": ORDINALS,
+    "FREQUENCIES": FREQUENCIES,
+    "CLOCK_HOURS": CLOCK_HOURS,
+    "CLOCK_MINUTES": CLOCK_MINUTES,
+    "DAY_ORDINALS": DAY_ORDINALS,
+    "NEXT_HOURS": NEXT_HOURS,
+    "HALF_HOURS": HALF_HOURS,
+}
+VERBATIM_VOCABULARIES = {"CLOCK_HOURS", "CLOCK_MINUTES", "NEXT_HOURS", "HALF_HOURS"}
+
+
 def time_of_day(value):
     if value is None:
         return
@@ -297,16 +520,53 @@ def day(value):
 
 
 # time
+def spelled(attribute, name):
+    # Значение слова из словаря name: «второго» -> 2.
+    words = VOCABULARIES[name]
+    return rule(vocabulary(name).interpretation(attribute.normalized().custom(words.__getitem__)))
+
+
+def clock_number(attribute, start, stop, name):
+    # 5 или пять
+    return or_(
+        rule(and_(gte(start), lte(stop)).interpretation(attribute.custom(to_int))),
+        spelled(attribute, name),
+    )
+
+
+# 2го, 5-е
+ORDINAL_SUFFIX = rule(rule("-").optional(), in_caseless({"го", "ого", "е", "ое"}))
+
 HOUR_WORD = rule(normalized("час"))
-HOUR = rule(
-    and_(gte(1), lte(24)).interpretation(Hour.hour.custom(to_int)), HOUR_WORD.optional()
+HOUR = or_(
+    rule(clock_number(Hour.hour, 1, 24, "CLOCK_HOURS"), HOUR_WORD.optional()),
+    # в час дня
+    rule(normalized("час").interpretation(Hour.hour.const(1))),
 ).interpretation(Hour)
 
 MINUTE_WORD = rule(normalized("минута"))
 MINUTE = rule(
-    and_(gte(0), lte(59)).interpretation(Minute.minute.custom(to_int)), MINUTE_WORD.optional()
+    clock_number(Minute.minute, 0, 59, "CLOCK_MINUTES"), MINUTE_WORD.optional()
 ).interpretation(Minute)
 
+NEXT_HOUR = or_(
+    spelled(PastHour.hour, "NEXT_HOURS"),
+    rule(
+        and_(gte(1), lte(12)).interpretation(PastHour.hour.custom(to_int)),
+        ORDINAL_SUFFIX.optional(),
+    ),
+)
+PAST_HOUR = or_(
+    # 10 минут второго, двадцать минут третьего
+    rule(clock_number(PastHour.minute, 0, 59, "CLOCK_MINUTES"), MINUTE_WORD, NEXT_HOUR),
+    # четверть второго
+    rule(caseless("четверть").interpretation(PastHour.minute.const(15)), NEXT_HOUR),
+    # пол второго, пол 2го, половина второго
+    rule(or_(caseless("пол"), normalized("половина")), NEXT_HOUR),
+    # полвторого
+    spelled(PastHour.hour, "HALF_HOURS"),
+).interpretation(PastHour)
+
 HOUR_MINUTE_SEPARATOR = or_(rule(":"), rule(" "), rule("-"))
 DATE_SEPARATOR = or_(rule("-"), rule("."), rule("/"))
 
@@ -317,17 +577,23 @@ HOUR_AND_MINUTE = rule(
 ).interpretation(HourAndMinute)
 
 TIME = or_(
+    PAST_HOUR.interpretation(Time.time),
     HOUR_AND_MINUTE.interpretation(Time.time),
     HOUR.interpretation(Time.time),
     MINUTE.interpretation(Time.time),
 ).interpretation(Time)
 
 # date
-DAY = or_(rule(and_(gte(1), lte(31)))).interpretation(Date.day.custom(to_int))
+DAY = or_(
+    rule(and_(gte(1), lte(31)).interpretation(Date.day.custom(to_int)), ORDINAL_SUFFIX.optional()),
+    spelled(Date.day, "DAY_ORDINALS"),
+)
 MONTH = and_(gte(1), lte(12)).interpretation(Date.month.custom(to_int))
 YEAR = and_(gte(1), lte(2099)).interpretation(Date.year.custom(to_int))
 YEAR_WORDS = or_(rule(caseless("г"), "."), rule(normalized("год")))
-MONTH_NAME = dictionary(MONTHS).interpretation(Date.month.normalized().custom(MONTHS.__getitem__))
+MONTH_NAME = vocabulary("MONTHS").interpretation(
+    Date.month.normalized().custom(MONTHS.__getitem__)
+)
 DATE = or_(
     rule(YEAR, DATE_SEPARATOR, MONTH, DATE_SEPARATOR, DAY),
     rule(DAY, DATE_SEPARATOR, MONTH_NAME, DATE_SEPARATOR, YEAR.optional(), YEAR_WORDS.optional()),
@@ -335,11 +601,11 @@ DATE = or_(
     rule(DAY, MONTH_NAME, YEAR.optional(), YEAR_WORDS.optional()),
 ).interpretation(Date)
 
-DAYNAME = dictionary(DAYS).interpretation(DayName.name.normalized().custom(day))
+DAYNAME = vocabulary("DAYS").interpretation(DayName.name.normalized().custom(day))
 
 AT = or_(rule("в"), rule("во"))
 FROM = or_(rule("с"))
-AT_TIME_OF_DAY = dictionary(TIMES_OF_DAY).interpretation(
+AT_TIME_OF_DAY = vocabulary("TIMES_OF_DAY").interpretation(
     TimeOfDay.time.normalized().custom(time_of_day)
 )
 
@@ -354,7 +620,7 @@ EXACT_TIME = or_(
         AT,
         TIME.interpretation(AtTime.time),
         AT_TIME_OF_DAY.optional().interpretation(AtTime.time_of_day),
-    ),
+    ).named("DAY_AT_TIME"),
     # в время день (время дня)
     # в 10 завтра утром
     # в 10 завтра
@@ -363,14 +629,14 @@ EXACT_TIME = or_(
         TIME.interpretation(AtTime.time),
         DAYNAME.optional().interpretation(AtTime.day),
         AT_TIME_OF_DAY.optional().interpretation(AtTime.time_of_day),
-    ),
+    ).named("AT_TIME_DAY"),
     # в день (время дня)
     # в субботу утром
     rule(
         AT,
         DAYNAME.interpretation(AtTime.day),
         AT_TIME_OF_DAY.optional().interpretation(AtTime.time_of_day),
-    ),
+    ).named("AT_DAY"),
     # дата в время (время дня)
     # 17.04.2018 в 9
     rule(
@@ -378,98 +644,423 @@ EXACT_TIME = or_(
         AT,
         TIME.interpretation(AtTime.time),
         AT_TIME_OF_DAY.optional().interpretation(AtTime.time_of_day),
-    ),
+    ).named("DATE_AT_TIME"),
     # ... вечером
     # сходить в магазин вечером
     rule(
         DAYNAME.optional().interpretation(AtTime.day),
         AT_TIME_OF_DAY.interpretation(AtTime.time_of_day),
-    ),
+    ).named("TIME_OF_DAY"),
     # завтра утром в 10:35
     rule(
         DAYNAME.interpretation(AtTime.day),
         AT_TIME_OF_DAY.interpretation(AtTime.time_of_day),
         AT,
         TIME.interpretation(AtTime.time),
-    ),
+    ).named("DAY_TIME_OF_DAY_AT_TIME"),
     # завтра с утра
     rule(
         DAYNAME.optional().interpretation(AtTime.day),
         FROM,
         TIME.interpretation(AtTime.time).optional(),
         AT_TIME_OF_DAY.interpretation(AtTime.time_of_day),
-    ),
+    ).named("FROM_TIME_OF_DAY"),
     # ... завтра
-    rule(AT.optional(), DAYNAME.interpretation(AtTime.day)),
+    rule(AT.optional(), DAYNAME.interpretation(AtTime.day)).named("DAY"),
 ).interpretation(AtTime)
 
-# Для обработки особого случая
-DAYNAME_ON_START = rule(AT.optional(), DAYNAME.interpretation(DayName.name)).interpretation(DayName)
+AFTER = rule(caseless('через'))
+AMOUNT = or_(
+    rule(and_(gte(1), lte(1000))).interpretation(Amount.value.custom(to_int)),
+    rule(vocabulary("NUMBER_WORDS")).interpretation(
+        Amount.value.normalized().custom(NUMBER_WORDS.__getitem__)
+    ),
+)
+
 
+def delta_unit(word, attribute):
+    # 2 часа, два дня, час
+    return rule(AMOUNT.optional(), normalized(word)).interpretation(Amount).interpretation(attribute)
+
+
+DELTA_UNIT = or_(
+    delta_unit("год", DeltaTime.years),
+    delta_unit("месяц", DeltaTime.months),
+    delta_unit("неделя", DeltaTime.weeks),
+    delta_unit("день", DeltaTime.days),
+    delta_unit("час", DeltaTime.hours),
+    delta_unit("минута", DeltaTime.minutes),
+    delta_unit("секунда", DeltaTime.seconds),
+)
+DELTA_SEPARATOR = or_(rule(","), rule("и"), rule(",", "и"))
 
-AFTER = rule('через')
 DELTA_TIME = or_(
+    # через 2 часа 20 минут, через 3 месяца, 1 неделю и 1 день
     rule(
         AFTER,
-        MINUTE.interpretation(DeltaTime.minutes),
-    )
+        DELTA_UNIT,
+        rule(DELTA_SEPARATOR.optional(), DELTA_UNIT).repeatable().optional(),
+    ).named("AFTER_DELTA"),
+    # через 20
+    rule(
+        AFTER,
+        rule(AMOUNT).interpretation(Amount).interpretation(DeltaTime.minutes),
+    ).named("AFTER_MINUTES"),
 ).interpretation(DeltaTime)
 
-ParseResult = fact('ParseResult', ['exact', 'delta'])
+EVERY = vocabulary("EVERY_WORDS")
+INTERVAL = or_(
+    rule(and_(gte(1), lte(1000))).interpretation(Recurrence.interval.custom(to_int)),
+    rule(vocabulary("ORDINALS")).interpretation(
+        Recurrence.interval.normalized().custom(ORDINALS.__getitem__)
+    ),
+)
+FREQUENCY = vocabulary("FREQUENCIES").interpretation(
+    Recurrence.frequency.normalized().custom(FREQUENCIES.__getitem__)
+)
+WEEKDAY = vocabulary("WEEKDAYS").interpretation(Recurrence.weekday.normalized().custom(day))
+MONTH_DAY = and_(gte(1), lte(31)).interpretation(Recurrence.month_day.custom(to_int))
+RECURRING_MONTH_NAME = vocabulary("MONTHS").interpretation(
+    Recurrence.month.normalized().custom(MONTHS.__getitem__)
+)
+RECURRING_TIME_OF_DAY = vocabulary("RECURRING_TIMES_OF_DAY").interpretation(
+    Recurrence.time_of_day.normalized().custom(time_of_day)
+)
+RECURRING_TIME = rule(
+    AT,
+    TIME.interpretation(Recurrence.time),
+    AT_TIME_OF_DAY.optional().interpretation(Recurrence.time_of_day),
+)
+
+RECURRENCE = or_(
+    # каждую среду в 17-30, каждый второй понедельник
+    rule(EVERY, INTERVAL.optional(), WEEKDAY, RECURRING_TIME.optional()).named("EVERY_WEEKDAY"),
+    # каждые 10 минут, каждый день в 18
+    rule(EVERY, INTERVAL.optional(), FREQUENCY, RECURRING_TIME.optional()).named("EVERY_UNIT"),
+    # каждое утро
+    rule(
+        EVERY,
+        RECURRING_TIME_OF_DAY,
+        rule(AT, TIME.interpretation(Recurrence.time)).optional(),
+    ).named("EVERY_TIME_OF_DAY"),
+    # каждое 1 число месяца
+    rule(
+        EVERY,
+        MONTH_DAY,
+        normalized("число"),
+        normalized("месяц").optional(),
+        RECURRING_TIME.optional(),
+    ).named("EVERY_MONTH_DAY"),
+    # каждое 30 мая
+    rule(EVERY, MONTH_DAY, RECURRING_MONTH_NAME, RECURRING_TIME.optional()).named("EVERY_DATE"),
+).interpretation(Recurrence)
+
+# Имена альтернатив EXACT_TIME, DELTA_TIME и RECURRENCE, для трассировки и метрик.
+RECURRENCE_RULE_NAMES = frozenset(
+    ["EVERY_WEEKDAY", "EVERY_UNIT", "EVERY_TIME_OF_DAY", "EVERY_MONTH_DAY", "EVERY_DATE"]
+)
+RULE_NAMES = RECURRENCE_RULE_NAMES | {
+    "DAY_AT_TIME",
+    "AT_TIME_DAY",
+    "AT_DAY",
+    "DATE_AT_TIME",
+    "TIME_OF_DAY",
+    "DAY_TIME_OF_DAY_AT_TIME",
+    "FROM_TIME_OF_DAY",
+    "DAY",
+    "AFTER_DELTA",
+    "AFTER_MINUTES",
+}
+
+ParseResult = fact('ParseResult', ['exact', 'delta', 'recurrence'])
 class ParseResult(ParseResult):
     @property
     def result(self):
-        return self.exact or self.delta
+        return self.exact or self.delta or self.recurrence
 
 
 EXACT_OR_DELTA = or_(
     EXACT_TIME.interpretation(ParseResult.exact),
     DELTA_TIME.interpretation(ParseResult.delta),
+    RECURRENCE.interpretation(ParseResult.recurrence),
 ).interpretation(ParseResult)
 
 
-# parser = Parser(EXACT_TIME)
-parser = Parser(EXACT_OR_DELTA)
-at_dayname_parser = Parser(DAYNAME_ON_START)
+MISSING = object()
+
+
+def dictionary_path() -> Optional[str]:
+    # Без явного пути pymorphy2 ищет словари через pkg_resources,
+    # а импорт pkg_resources дольше самой загрузки словарей.
+    try:
+        import pymorphy2_dicts_ru
+    except ImportError:
+        return None
+    return pymorphy2_dicts_ru.get_path()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with hit statistics."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
 
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
 
-Extract = namedtuple("Extract", "time, task, time_string, match")
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
 
+    def __len__(self):
+        return len(self._data)
 
-def extractor(string, moment=None) -> Optional[Extract]:
-    moment = moment or dt.datetime.now()
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / (self.hits + self.misses) if self.hits else 0.0,
+            }
+
+
+# Разборы слов общие для всех парсеров процесса: словарь напоминаний
+# небольшой, и «завтра», «вечером», «пятницу» разбираются один раз.
+morph_cache = LRUCache(maxsize=10000)
+
+
+class DictionaryMorphAnalyzer(YargyMorphAnalyzer):
+    """yargy morph analyzer backed by the process-wide morph_cache."""
+
+    def __init__(self, cache=morph_cache):
+        super().__init__(MorphAnalyzer(path=dictionary_path()))
+        self.cache = cache
+
+    def __call__(self, word):
+        # pymorphy2 всё равно приводит слово к нижнему регистру.
+        key = word.lower()
+        forms = self.cache.get(key, MISSING)
+        if forms is MISSING:
+            forms = super().__call__(word)
+            self.cache.put(key, forms)
+        return forms
+
+
+@functools.lru_cache(maxsize=None)
+def get_parser() -> Parser:
+    """Build the parser on first use.
+
+    Loading the morphology dictionaries is most of the startup cost, so it is
+    deferred until something is parsed; processes that fork parse workers
+    call this first, and the workers inherit the parser.
+    """
+    tokenizer = MorphTokenizer(morph=DictionaryMorphAnalyzer())
+    tagger = VocabularyTagger(VOCABULARIES, tokenizer.morph.raw, VERBATIM_VOCABULARIES)
+    return Parser(EXACT_OR_DELTA, tokenizer=tokenizer, tagger=tagger)
+
+
+# rule — строка RRULE (RFC 5545, с DTSTART) для повторяющихся напоминаний,
+# time — первое срабатывание, alternative — сработавшая альтернатива грамматики,
+# past — явная дата, которая уже прошла: напоминать о ней поздно.
+Extract = namedtuple("Extract", "time, task, time_string, match, rule, alternative, past")
+Extract.__new__.__defaults__ = (None, None, False)
+
+logger = logging.getLogger(__name__)
+
+
+# Каждое правило грамматики содержит хотя бы один якорь (в, во, с, через)
+# или слово из словарей DAYS, MONTHS, TIMES_OF_DAY, EVERY_WORDS. Сообщения без них
+# отбрасываются до токенизации и морфологического анализа.
+ANCHORS = {"в", "во", "с", "через"}
+WORD_RE = re.compile(r"[а-яё]+")
+
+
+@functools.lru_cache(maxsize=None)
+def temporal_words() -> frozenset:
+    forms = get_parser().tagger.forms("DAYS", "MONTHS", "TIMES_OF_DAY", "EVERY_WORDS")
+    return frozenset(ANCHORS | forms)
+
+
+def warm_up():
+    """Build the parser and the prefilter vocabulary now, not on the first message."""
+    get_parser()
+    temporal_words()
+
+
+def may_contain_time(string) -> bool:
+    words = WORD_RE.findall(string.lower().replace("ё", "е"))
+    return not temporal_words().isdisjoint(words)
+
+
+def matched_rule(match) -> Optional[str]:
+    """Return the name of the grammar alternative that produced match."""
+    nodes = [match.tree.root]
+    while nodes:
+        node = nodes.pop()
+        if node.rule.label in RULE_NAMES:
+            return node.rule.label
+        nodes.extend(child for child in node.children if hasattr(child, "rule"))
+
+
+def is_day_only(parse_result) -> bool:
+    exact = parse_result.exact
+    return bool(exact and exact.day and not exact.time and not exact.time_of_day)
+
+
+# Результат разбора без привязки ко времени: fact.get_datetime(moment)
+# вызывается заново для каждого сообщения. Разобранные факты разделяются
+# между потоками через кеш и не должны изменяться.
+Parsed = namedtuple("Parsed", "fact, task, time_string, match, alternative")
+
+
+def parse(string) -> Optional[Parsed]:
+    # Один проход парсера: совпадения отсортированы по позиции, берём первое.
+    matches = list(get_parser().findall(string))
+    if not matches:
+        logger.debug("no match in %r", string)
+        return
+
+    # Повторение важнее точного времени в той же фразе:
+    # погладить рубашку на завтра каждое воскресенье в 19:00.
+    match = next(
+        (match for match in matches if matched_rule(match) in RECURRENCE_RULE_NAMES),
+        matches[0],
+    )
+    fact = match.fact.result
+    spans = [match.span]
 
     # Особый случай, когда вначале строки может быть указатель на день:
     # сегодня в магазин в 10; в субботу в магазин в 12 и тд.
-    matches = list(at_dayname_parser.findall(string))
-    day_match = None
-    day_time_string = ""
+    if match.span.start == 0 and is_day_only(match.fact):
+        if len(matches) > 1:
+            time_match = matches[1]
+            time_result = time_match.fact
+            if time_result.exact and not time_result.exact.day:
+                exact = time_result.exact
+                fact = AtTime(time=exact.time, time_of_day=exact.time_of_day, day=fact.day)
+                match = time_match
+                spans.append(match.span)
 
-    if len(matches) == 1:
-        match = matches[0]
-        if match.span.start == 0:
-            day_match = match
+    alternative = matched_rule(match)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("matched rule=%s spans=%s fact=%r in %r", alternative, spans, fact, string)
 
-    matches = list(parser.findall(string))
-    if not matches:
+    task = string
+    for span in reversed(spans):
+        task = task[: span.start] + task[span.stop :]
+
+    time_string = " ".join(string[span.start : span.stop] for span in spans)
+    return Parsed(fact, task.strip(), time_string, match, alternative)
+
+
+# Результаты parse(), включая промахи (None).
+parse_cache = LRUCache()
+
+
+def extractor(string, moment=None) -> Optional[Extract]:
+    moment = moment or dt.datetime.now()
+
+    if not may_contain_time(string):
         return
 
-    match = matches[0]
-    print(match)
-    print(match.span)
+    # Разбор не зависит от момента: всё время вычисляется в get_datetime(moment).
+    parsed = parse_cache.get(string, MISSING)
+    if parsed is MISSING:
+        parsed = parse(string)
+        parse_cache.put(string, parsed)
 
-    task = (string[: match.span.start] + string[match.span.stop :]).strip()
+    if parsed is None:
+        return
 
-    parse_result = match.fact
-    print(parse_result)
+    fact = parsed.fact
+    if isinstance(fact, Recurrence):
+        rule = fact.get_rrule(moment)
+        time = rule.after(moment)
+        if time is None:
+            # каждое 30 февраля: правило без единого срабатывания.
+            logger.debug("no occurrences of %s in %r", rule, string)
+            return
+        return Extract(
+            time, parsed.task, parsed.time_string, parsed.match, str(rule), parsed.alternative
+        )
+
+    try:
+        time = fact.get_datetime(moment)
+    except ValueError:
+        # 31 февраля, 29 февраля не в високосный год: такой даты нет.
+        logger.debug("no such date in %r", string)
+        return
+    # Время без даты postprocess сдвигает вперёд, в прошлом остаётся только
+    # явная дата («17.04.2018 в 9» в июне). Её не переносим, а помечаем.
+    return Extract(
+        time,
+        parsed.task,
+        parsed.time_string,
+        parsed.match,
+        alternative=parsed.alternative,
+        past=time < moment,
+    )
 
-    fact = parse_result.result  # ParseResult
-    if parse_result.exact:
-        if not fact.day and day_match:
-            fact.day = day_match.fact.name
-            day_time_string = string[day_match.span.start : day_match.span.stop] + " "
-            task = task[day_match.span.stop :].strip()
 
-    time = fact.get_datetime(moment)
-    time_string = day_time_string + string[match.span.start : match.span.stop]
-    return Extract(time, task, time_string, match)
+def detached_extractor(string, moment) -> Optional[Extract]:
+    # Дерево разбора (match) не сериализуется pickle, в процесс-родитель
+    # передаются только время, задача и строка времени.
+    extract = extractor(string, moment)
+    if extract is None:
+        return
+    return extract._replace(match=None)
+
+
+def extract_many(
+    strings: Iterable[str], moment=None, processes=None, chunksize=64, function=None
+) -> Iterator[Optional[Extract]]:
+    """Extract every string against one moment, yielding results in input order.
+
+    With processes > 1 parsing is spread over a process pool; the input is
+    consumed in bounded batches and yielded extracts have match=None.
+    function(string, moment) replaces the extractor; with a pool it must be
+    picklable and its results too.
+    """
+    moment = moment or dt.datetime.now()
+
+    if not processes or processes == 1:
+        for string in strings:
+            yield (function or extractor)(string, moment)
+        return
+
+    strings = iter(strings)
+    batch_size = processes * chunksize * 4
+    # Рабочие процессы наследуют готовый парсер при fork.
+    warm_up()
+    worker = functools.partial(function or detached_extractor, moment=moment)
+    with multiprocessing.Pool(processes) as pool:
+        while True:
+            batch = list(itertools.islice(strings, batch_size))
+            if not batch:
+                break
+            yield from pool.imap(worker, batch, chunksize)
@@ -0,0 +1,132 @@
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl
+
+TOKEN = "123456:fake-token"
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeTelegram:
+    """Local stand-in for the Bot API (getMe, getUpdates, sendMessage).
+
+    Point telegram.Bot at it with base_url=fake.base_url to benchmark or test
+    the bot runtime without network access.
+    """
+
+    def __init__(self, token=TOKEN, host="127.0.0.1", port=0):
+        self.token = token
+        self.updates = []
+        self.sent = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def push(self, chat_id, text) -> dict:
+        """Queue an incoming text message and return the update."""
+        with self._condition:
+            update = {
+                "update_id": next(self._update_ids),
+                "message": self.message(chat_id, text),
+            }
+            self.updates.append(update)
+            self._condition.notify_all()
+            return update
+
+    def message(self, chat_id, text) -> dict:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "user"},
+            "text": text,
+        }
+
+    def wait_sent(self, count, timeout=10) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self.sent) >= count, timeout)
+
+    def get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        with self._condition:
+            self._condition.wait_for(
+                lambda: any(update["update_id"] >= offset for update in self.updates), timeout
+            )
+            # Подтверждённые обновления больше не нужны.
+            self.updates = [update for update in self.updates if update["update_id"] >= offset]
+            return self.updates[: int(params.get("limit") or 100)]
+
+    def send_message(self, params):
+        message = self.message(int(params["chat_id"]), params["text"])
+        with self._condition:
+            self.sent.append((time.perf_counter(), message))
+            self._condition.notify_all()
+        return message
+
+    def call(self, method, params):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "fake", "username": "fake_bot"}
+        if method == "getUpdates":
+            return self.get_updates(params)
+        if method == "sendMessage":
+            return self.send_message(params)
+        raise KeyError(method)
+
+    def handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                prefix = f"/bot{fake.token}/"
+                if not self.path.startswith(prefix):
+                    return self.reply(404, {"ok": False, "description": "Not Found"})
+
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = dict(parse_qsl(body.decode()))
+
+                try:
+                    result = fake.call(self.path[len(prefix):], params)
+                except KeyError:
+                    return self.reply(404, {"ok": False, "description": "Not Found"})
+                self.reply(200, {"ok": True, "result": result})
+
+            do_GET = do_POST
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
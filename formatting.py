@@ -0,0 +1,81 @@
+import datetime as dt
+import functools
+from collections import namedtuple
+
+WEEKDAYS = ["понедельник", "вторник", "среда", "четверг", "пятница", "суббота", "воскресенье"]
+
+# «в эту среду»: винительный падеж и род названия дня.
+THIS_WEEKDAYS = [
+    "в этот понедельник",
+    "в этот вторник",
+    "в эту среду",
+    "в этот четверг",
+    "в эту пятницу",
+    "в эту субботу",
+    "в это воскресенье",
+]
+
+# Родительный падеж: «23 мая».
+MONTHS = [
+    "января",
+    "февраля",
+    "марта",
+    "апреля",
+    "мая",
+    "июня",
+    "июля",
+    "августа",
+    "сентября",
+    "октября",
+    "ноября",
+    "декабря",
+]
+
+Days = namedtuple("Days", "today, tomorrow, day_after_tomorrow, week_end")
+
+
+@functools.lru_cache(maxsize=64)
+def day_boundaries(today) -> Days:
+    """Dates that human_format compares against, computed once per day.
+
+    Keyed by date, so a new entry appears at midnight; chats in different
+    timezones may be on different dates at once.
+    """
+    return Days(
+        today,
+        today + dt.timedelta(days=1),
+        today + dt.timedelta(days=2),
+        today + dt.timedelta(days=6 - today.weekday()),
+    )
+
+
+def format_time(moment):
+    if moment.minute:
+        return f"в {moment.hour}:{moment.minute:02}"
+    return f"в {moment.hour}"
+
+
+def format_date(moment, now):
+    date = f"{moment.day} {MONTHS[moment.month - 1]}"
+    if moment.year != now.year:
+        date += f" {moment.year}"
+    return date
+
+
+def human_format(moment, now):
+    """Describe moment relative to now, e.g. "завтра в 10:05", "в эту среду в 9"."""
+    days = day_boundaries(now.date())
+    date = moment.date()
+
+    if date == days.today:
+        day = "сегодня"
+    elif date == days.tomorrow:
+        day = "завтра"
+    elif date == days.day_after_tomorrow:
+        day = f"послезавтра ({WEEKDAYS[date.weekday()]})"
+    elif days.today < date <= days.week_end:
+        day = THIS_WEEKDAYS[date.weekday()]
+    else:
+        day = format_date(moment, now)
+
+    return f"{day} {format_time(moment)}"
@@ -0,0 +1,214 @@
+import bisect
+import sys
+import threading
+import time
+from collections import Counter as Tally
+
+from webhook import HTTPServer, Response
+
+# Секунды: от быстрого ответа из кеша до медленного разбора под нагрузкой.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return lines + list(self.samples())
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help):
+        super().__init__(name, help)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            yield f"{self.name}{format_labels(labels)} {value}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self.values.get(key) or ([0] * (len(self.buckets) + 1), 0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = [
+                (labels, list(counts), total) for labels, (counts, total) in self.values.items()
+            ]
+        for labels, counts, total in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{format_labels(labels, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{format_labels(labels)} {total}"
+            yield f"{self.name}_count{format_labels(labels)} {cumulative}"
+
+
+class Gauge(Metric):
+    """Value read at scrape time.
+
+    func() returns a number, or a dict mapping label tuples such as
+    (("cache", "parse"),) to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, func, kind="gauge"):
+        super().__init__(name, help)
+        self.func = func
+        self.kind = kind
+
+    def samples(self):
+        value = self.func()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, number in sorted(value.items()):
+            yield f"{self.name}{format_labels(labels)} {number}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        """Add metric, replacing a previously registered one with the same name."""
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads every interval seconds while running.
+
+    Stacks are aggregated in the collapsed format ("outer;inner count" per
+    line) that flamegraph tools read. Costs nothing until started.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stacks = Tally()
+        self._thread = None
+        self._running = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    def start(self):
+        if self.running:
+            return
+        self.stacks = Tally()
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._running.clear()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        # dict() копирует атомарно, пока поток профилировщика дописывает стеки.
+        stacks = Tally(dict(self.stacks))
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def _run(self):
+        own = threading.get_ident()
+        while self._running.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+
+class MetricsServer(HTTPServer):
+    """Local endpoint: GET /metrics in the Prometheus text format.
+
+    With a profiler, GET /profile/start starts sampling, /profile returns the
+    stacks collected so far and /profile/stop stops and returns them.
+    """
+
+    def __init__(self, registry=registry, profiler=None, host="127.0.0.1", port=9100):
+        super().__init__(host, port)
+        self.registry = registry
+        self.profiler = profiler
+
+    async def handle_request(self, method, target, body) -> Response:
+        if method != "GET":
+            return Response(405)
+
+        path = target.split("?", 1)[0]
+        if path == "/metrics":
+            return self.text(self.registry.render(), "text/plain; version=0.0.4")
+
+        if self.profiler is None or not path.startswith("/profile"):
+            return Response(404)
+        if path == "/profile/start":
+            self.profiler.start()
+            return self.text("started\n")
+        if path == "/profile/stop":
+            return self.text(self.profiler.stop())
+        if path == "/profile":
+            return self.text(self.profiler.collapsed())
+        return Response(404)
+
+    def text(self, text, content_type="text/plain; charset=utf-8"):
+        return Response(200, text.encode(), content_type)
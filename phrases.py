@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS unrecognized_phrases (
+    phrase TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    error INTEGER NOT NULL
+);
+"""
+
+# Длинные сообщения обрезаем: для работы над грамматикой хватает начала.
+MAX_LENGTH = 200
+
+
+def normalize(phrase):
+    return " ".join(phrase.lower().split())[:MAX_LENGTH]
+
+
+class PhraseCounter:
+    """Approximate top-K phrase counter (the Space-Saving algorithm).
+
+    At most capacity phrases are tracked. A new phrase evicts one of the least
+    frequent, inheriting its count as error, so count overestimates the true
+    frequency by at most error, and any phrase seen more than total / capacity
+    times is guaranteed to be tracked.
+
+    Phrases are grouped into buckets by count and the minimal count is tracked,
+    so add() is O(1).
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        self._buckets = {}
+        self._min = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, phrase):
+        return phrase in self.counts
+
+    def add(self, phrase, count=1, error=0):
+        self.total += count
+        if phrase in self.counts:
+            self._move(phrase, self.counts[phrase] + count)
+            return
+
+        if len(self.counts) >= self.capacity:
+            bucket = self._buckets[self._min]
+            evicted, _ = bucket.popitem(last=False)
+            error = self.counts.pop(evicted)
+            del self.errors[evicted]
+            if not bucket:
+                del self._buckets[self._min]
+            count += error
+
+        self.errors[phrase] = error
+        self._move(phrase, count)
+
+    def top(self, offset=0, limit=None) -> list:
+        """Return (phrase, count, error) triples, most frequent first."""
+        items = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        end = None if limit is None else offset + limit
+        return [(phrase, count, self.errors[phrase]) for phrase, count in items[offset:end]]
+
+    def _move(self, phrase, count):
+        old = self.counts.get(phrase)
+        if old is not None:
+            bucket = self._buckets[old]
+            del bucket[phrase]
+            if not bucket:
+                del self._buckets[old]
+        self.counts[phrase] = count
+        self._buckets.setdefault(count, OrderedDict())[phrase] = None
+
+        if count < self._min:
+            self._min = count
+        elif self._min not in self._buckets:
+            # Опустевший минимум обычно сменяется следующим счётчиком, иначе ищем.
+            self._min = count if old is not None and count == old + 1 else min(self._buckets)
+
+
+class UnrecognizedPhrases:
+    """Counts phrases that failed to parse; persisted in SQLite.
+
+    Changes are saved save_interval seconds after the first unsaved one, and on
+    close().
+    """
+
+    def __init__(self, path, capacity=1000, save_interval=60.0):
+        self.save_interval = save_interval
+        self.counter = PhraseCounter(capacity)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self._timer = None
+        self._lock = threading.RLock()
+        self.load()
+
+    def __len__(self):
+        return len(self.counter)
+
+    def load(self):
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT phrase, count, error FROM unrecognized_phrases ORDER BY count DESC"
+            )
+            for phrase, count, error in rows:
+                self.counter.add(phrase, count, error)
+
+    def add(self, phrase):
+        with self._lock:
+            self.counter.add(normalize(phrase))
+            if self._timer is None:
+                self._timer = threading.Timer(self.save_interval, self.save)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def page(self, number, size=20) -> list:
+        """Return the number-th page (from 1) of (phrase, count, error), most frequent first."""
+        with self._lock:
+            return self.counter.top((number - 1) * size, size)
+
+    def save(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            rows = self.counter.top()
+            with self.connection:
+                self.connection.execute("DELETE FROM unrecognized_phrases")
+                self.connection.executemany(
+                    "INSERT INTO unrecognized_phrases (phrase, count, error) VALUES (?, ?, ?)", rows
+                )
+
+    def close(self):
+        with self._lock:
+            self.save()
+            self.connection.close()
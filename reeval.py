@@ -0,0 +1,155 @@
+"""Re-evaluate a message log against the grammar and diff with a previous run.
+
+    python reeval.py messages.jsonl --output run.jsonl --previous last.jsonl --diff diff.jsonl
+
+Each input line is a JSON object with the message under --field ("text").
+The output has one result per input line, in order, so the next run can be
+diffed against it line by line: the log is streamed and memory stays
+constant whatever its size. A message the extractor fails on is recorded
+with its "error" and the run goes on.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from exact_time import extract_many, extractor
+
+MOMENT = "2018-01-01 12:00"
+MOMENT_FORMAT = "%Y-%m-%d %H:%M"
+FIELDS = ("time_string", "task", "time", "rule", "past")
+
+
+def read_texts(path, field="text"):
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)[field]
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def to_record(text, extract) -> dict:
+    if extract is None:
+        return {"text": text}
+    record = {
+        "text": text,
+        "time_string": extract.time_string,
+        "task": extract.task,
+        "time": extract.time.strftime(MOMENT_FORMAT),
+        "rule": extract.rule,
+        "alternative": extract.alternative,
+    }
+    # Ключ только у прошедших дат, чтобы старые записи сравнивались без изменений.
+    if extract.past:
+        record["past"] = True
+    return record
+
+
+def evaluate_one(text, moment) -> dict:
+    try:
+        return to_record(text, extractor(text, moment))
+    except Exception as error:
+        return {"text": text, "error": repr(error)}
+
+
+def diff(old, new) -> dict:
+    """Return {kind: [old, new]} for what changed between two records of one message."""
+    if old["text"] != new["text"]:
+        return {"text": [old["text"], new["text"]]}
+    if old.get("error") != new.get("error"):
+        return {"error": [old.get("error"), new.get("error")]}
+    recognized = "time" in old, "time" in new
+    if recognized == (True, False):
+        return {"unrecognized": [old.get("time_string"), None]}
+    if recognized == (False, True):
+        return {"recognized": [None, new["time_string"]]}
+    return {
+        field: [old.get(field), new.get(field)]
+        for field in FIELDS
+        if old.get(field) != new.get(field)
+    }
+
+
+def evaluate(texts, moment, processes=None):
+    """Yield a record for each text, in order."""
+    # Записи собираются в рабочих процессах: ошибка одного сообщения не
+    # долетает до пула и не обрывает прогон.
+    return extract_many(texts, moment, processes=processes, function=evaluate_one)
+
+
+def run(records, output, previous=None, diff_output=None) -> Counter:
+    """Write records to output, diffing each with the previous run; return change counts."""
+    stats = Counter()
+    previous_records = read_records(previous) if previous else iter(())
+    for index, record in enumerate(records, 1):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        stats["messages"] += 1
+        # Не "recognized": так называется и вид изменения в diff().
+        stats["with_time"] += "time" in record
+        stats["errors"] += "error" in record
+
+        old = next(previous_records, None)
+        if old is None:
+            continue
+        changes = diff(old, record)
+        for kind in changes:
+            stats[kind] += 1
+        if changes:
+            stats["changed"] += 1
+            if diff_output:
+                line = {"line": index, "text": record["text"], "changes": changes}
+                diff_output.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return stats
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    arguments.add_argument("input", help="JSONL message log")
+    arguments.add_argument("--field", default="text")
+    arguments.add_argument("--moment", default=MOMENT, help=f"reference moment, {MOMENT!r}")
+    arguments.add_argument("--output", required=True, help="results of this run (JSONL)")
+    arguments.add_argument("--previous", help="results of a previous run to diff against")
+    arguments.add_argument("--diff", help="write changed messages here (JSONL)")
+    arguments.add_argument("--processes", type=int, default=os.cpu_count())
+    args = arguments.parse_args(argv)
+
+    moment = dt.datetime.strptime(args.moment, MOMENT_FORMAT)
+    records = evaluate(read_texts(args.input, args.field), moment, args.processes)
+
+    # --output может совпадать с --previous: пишем рядом и подменяем в конце.
+    started = time.perf_counter()
+    temporary = args.output + ".tmp"
+    diff_output = open(args.diff, "w", encoding="utf-8") if args.diff else None
+    try:
+        with open(temporary, "w", encoding="utf-8") as output:
+            stats = run(records, output, args.previous, diff_output)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    finally:
+        if diff_output:
+            diff_output.close()
+    os.replace(temporary, args.output)
+    elapsed = time.perf_counter() - started
+
+    messages = stats.pop("messages", 0)
+    print(f"{messages} messages in {elapsed:.1f} s, {messages / elapsed:.0f} messages/s")
+    print(f"recognized: {stats.pop('with_time', 0)}")
+    print(f"errors: {stats.pop('errors', 0)}")
+    if args.previous:
+        print(f"changed: {stats.pop('changed', 0)}")
+        for kind, count in sorted(stats.items()):
+            print(f"  {kind}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
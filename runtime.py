@@ -0,0 +1,232 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+import time
+
+from exact_time import detached_extractor, morph_cache, parse_cache, warm_up
+from metrics import Counter, Gauge, Histogram, registry
+from sender import Sender
+
+logger = logging.getLogger(__name__)
+
+HANDLER_SECONDS = registry.register(
+    Histogram("bot_handler_seconds", "Update handling time by handler.")
+)
+HANDLER_ERRORS = registry.register(
+    Counter("bot_handler_errors_total", "Updates whose handler raised, by handler.")
+)
+PARSE_SECONDS = registry.register(
+    Histogram("bot_parse_seconds", "Extraction time by matched grammar alternative.")
+)
+PARSES = registry.register(Counter("bot_parses_total", "Extractions by result."))
+
+
+CACHES = {"parse": parse_cache, "morph": morph_cache}
+
+
+def parse_with_stats(text, moment):
+    # Кеши живут в процессе, который разбирает: при parse_processes > 1 это
+    # процессы пула, и их статистика возвращается вместе с результатом.
+    extract = detached_extractor(text, moment)
+    return extract, os.getpid(), {cache: CACHES[cache].stats() for cache in CACHES}
+
+
+def combine_stats(snapshots) -> dict:
+    """Sum per-process cache stats, {pid: {cache: stats}}, into {cache: stats}."""
+    combined = {}
+    for cache in CACHES:
+        stats = [snapshot[cache] for snapshot in snapshots.values()]
+        hits = sum(item["hits"] for item in stats)
+        misses = sum(item["misses"] for item in stats)
+        combined[cache] = {
+            "hits": hits,
+            "misses": misses,
+            "evictions": sum(item["evictions"] for item in stats),
+            "size": sum(item["size"] for item in stats),
+            "hit_rate": hits / (hits + misses) if hits else 0.0,
+        }
+    return combined
+
+
+class Runtime:
+    """Asyncio bot runtime.
+
+    Update intake and Bot API calls are coroutines; the blocking python-telegram-bot
+    calls run in a small I/O thread pool, and parsing runs in a bounded executor
+    (a process pool when parse_processes > 1), so a slow parse delays only its chat.
+
+    Updates are sharded by chat_id over worker tasks with bounded queues: one
+    chat's updates are handled strictly in order, and intake waits when the
+    workers fall behind.
+
+    Outgoing messages go through a rate-limited Sender (see sender.py) configured
+    with send_options, so handlers never wait on Bot API flood limits.
+    """
+
+    def __init__(
+        self,
+        bot,
+        route,
+        workers=16,
+        queue_size=100,
+        parse_processes=None,
+        poll_timeout=10,
+        send_options=None,
+    ):
+        self.bot = bot
+        self.route = route
+        self.workers = workers
+        self.queue_size = queue_size
+        self.poll_timeout = poll_timeout
+        self.send_options = send_options or {}
+        self.offset = None
+        self.loop = None
+        self.sender = None
+        self.queues = []
+        self.io_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        if parse_processes and parse_processes > 1:
+            self.parse_executor = concurrent.futures.ProcessPoolExecutor(parse_processes)
+        else:
+            self.parse_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._tasks = []
+        self._stopped = None
+        # Последняя статистика кешей каждого процесса, разбиравшего сообщения.
+        self._cache_stats = {}
+
+    async def call(self, func, *args, **kwargs):
+        """Run a blocking call (Bot API request, database write) in the I/O pool."""
+        call = functools.partial(func, *args, **kwargs)
+        return await self.loop.run_in_executor(self.io_executor, call)
+
+    async def parse(self, text, moment=None):
+        started = time.perf_counter()
+        extract, pid, stats = await self.loop.run_in_executor(
+            self.parse_executor, parse_with_stats, text, moment
+        )
+        self._cache_stats[pid] = stats
+        alternative = extract.alternative if extract else "none"
+        PARSE_SECONDS.observe(time.perf_counter() - started, alternative=alternative)
+        PARSES.inc(result="success" if extract else "failure")
+        return extract
+
+    def cache_stats(self, name) -> dict:
+        """Return {labels: value} of stat name for each cache, summed over parsing processes."""
+        combined = combine_stats(self._cache_stats)
+        return {(("cache", cache),): combined[cache][name] for cache in combined}
+
+    async def send_message(self, chat_id, text, coalesce=False):
+        """Queue a message; it is sent in order with the chat's other messages."""
+        self.sender.enqueue(chat_id, text, coalesce)
+
+    def send_message_threadsafe(self, chat_id, text, coalesce=False):
+        """Queue a message from another thread, e.g. the reminder scheduler."""
+        self.loop.call_soon_threadsafe(self.sender.enqueue, chat_id, text, coalesce)
+
+    async def _send(self, chat_id, text):
+        return await self.call(self.bot.send_message, chat_id=chat_id, text=text)
+
+    async def dispatch(self, update):
+        message = update.message
+        chat_id = message.chat_id if message else 0
+        await self.queues[chat_id % self.workers].put(update)
+
+    async def handle(self, update):
+        handler = self.route(update)
+        if handler is None:
+            return
+        name = handler.__name__
+        started = time.perf_counter()
+        try:
+            await handler(self, update)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            logger.exception('Update "%s" caused error', update)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+
+    async def worker(self, queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.handle(update)
+            finally:
+                queue.task_done()
+
+    async def poll(self):
+        while not self._stopped.is_set():
+            try:
+                updates = await self.call(
+                    self.bot.get_updates, offset=self.offset, timeout=self.poll_timeout
+                )
+            except Exception:
+                logger.exception("getUpdates failed")
+                await asyncio.sleep(1)
+                continue
+
+            for update in updates:
+                self.offset = update.update_id + 1
+                await self.dispatch(update)
+
+    async def start(self):
+        self.loop = asyncio.get_event_loop()
+        # До первого разбора: процессы пула наследуют готовый парсер.
+        await self.call(warm_up)
+        self._stopped = asyncio.Event()
+        self.queues = [asyncio.Queue(self.queue_size) for _ in range(self.workers)]
+        self._tasks = [self.loop.create_task(self.worker(queue)) for queue in self.queues]
+        self.sender = Sender(self._send, **self.send_options)
+        self.sender.start()
+        self.register_metrics()
+
+    def register_metrics(self):
+        sender = self.sender
+        counters = {
+            "bot_sent_total": ("Messages sent.", lambda: sender.sent),
+            "bot_send_failures_total": ("Messages dropped.", lambda: sender.failed),
+            "bot_send_retries_total": ("Send retries.", lambda: sender.retries),
+        }
+        gauges = {
+            "bot_send_queue_depth": ("Messages waiting to be sent.", lambda: sender.queue_depth),
+            "bot_send_latency_seconds": (
+                "Time from queueing to sending, over the last 1000 messages.",
+                lambda: {
+                    (("quantile", "0.5"),): sender.stats()["latency_p50"],
+                    (("quantile", "0.99"),): sender.stats()["latency_p99"],
+                },
+            ),
+            "bot_cache_hit_ratio": ("Cache hit ratio.", lambda: self.cache_stats("hit_rate")),
+            "bot_cache_size": ("Cache entries.", lambda: self.cache_stats("size")),
+        }
+        for name, (help, func) in counters.items():
+            registry.register(Gauge(name, help, func, kind="counter"))
+        for name, (help, func) in gauges.items():
+            registry.register(Gauge(name, help, func))
+
+    async def join(self):
+        """Wait until every dispatched update has been handled."""
+        for queue in self.queues:
+            await queue.join()
+
+    async def run(self):
+        await self.start()
+        try:
+            await self.poll()
+        finally:
+            await self.shutdown()
+
+    async def wait_stopped(self):
+        await self._stopped.wait()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._stopped.set)
+
+    async def shutdown(self):
+        await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.sender.stop()
+        self.io_executor.shutdown(wait=False)
+        self.parse_executor.shutdown(wait=False)
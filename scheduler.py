@@ -0,0 +1,204 @@
+import datetime as dt
+import heapq
+import itertools
+import logging
+import threading
+from collections import namedtuple
+
+from dateutil import rrule
+
+from timezones import zone_table
+
+logger = logging.getLogger(__name__)
+
+# time — ближайшее срабатывание в UTC, rule — строка RRULE для повторяющихся
+# напоминаний, timezone — зона чата, в которой правило разворачивается.
+Reminder = namedtuple("Reminder", "time, chat_id, task, id, rule, timezone")
+Reminder.__new__.__defaults__ = (None, None, None)
+
+
+def next_occurrence(reminder, now):
+    """Return the first occurrence of a recurring reminder after now.
+
+    The rule is restarted from reminder.time, so only the occurrences missed
+    since then are expanded, however long the series has been running. With a
+    timezone the rule is expanded in local time, so "every day at 9" stays at
+    9 across DST changes.
+    """
+    if reminder.timezone is None:
+        rule = rrule.rrulestr(reminder.rule).replace(dtstart=reminder.time)
+        return rule.after(max(now, reminder.time))
+
+    zone = zone_table(reminder.timezone)
+    start = zone.from_utc(reminder.time)
+    rule = rrule.rrulestr(reminder.rule).replace(dtstart=start)
+    time = rule.after(zone.from_utc(max(now, reminder.time)))
+    return time and zone.to_utc(time)
+
+
+# Верхняя граница ожидания: перепроверяем очередь, если системные часы сдвинулись.
+MAX_WAIT = 60
+
+
+class Scheduler:
+    """Fires reminders when they are due.
+
+    Pending reminders live in a binary heap ordered by time, so adding and
+    popping cost O(log n). A single worker thread sleeps until the earliest
+    reminder is due; idle cost does not depend on how many are pending.
+
+    With a store (see storage.ReminderStore) every reminder is persisted, and
+    only those due within window are kept in the heap. The next window is
+    loaded from the store when half of the current one has passed.
+
+    Reminder times and clock() are naive UTC.
+    """
+
+    def __init__(
+        self, callback, clock=dt.datetime.utcnow, store=None, window=dt.timedelta(hours=1)
+    ):
+        self.callback = callback
+        self.clock = clock
+        self.store = store
+        self.window = window
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._pending = set()
+        self._cancelled = set()
+        self._loaded_until = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def __len__(self):
+        """Number of reminders in memory; see store.count() for the total."""
+        with self._condition:
+            return len(self._pending)
+
+    def add(self, reminder) -> int:
+        """Schedule reminder and return its id, which can be passed to cancel()."""
+        with self._condition:
+            if self.store:
+                reminder = self.store.add(reminder)
+            else:
+                reminder = reminder._replace(id=next(self._ids))
+
+            if self._in_memory(reminder.time):
+                self._push(reminder)
+                if self._heap[0][1] == reminder.id:
+                    # Новое напоминание раньше всех остальных, будим поток.
+                    self._condition.notify()
+            return reminder.id
+
+    def cancel(self, reminder_id):
+        with self._condition:
+            if reminder_id in self._pending:
+                self._pending.remove(reminder_id)
+                self._cancelled.add(reminder_id)
+            if self.store:
+                self.store.remove(reminder_id)
+
+    def next_time(self):
+        with self._condition:
+            self._load(self.clock())
+            return self._next_time()
+
+    def pop_due(self, now=None) -> list:
+        """Remove and return reminders due at now (default: clock()), earliest first."""
+        with self._condition:
+            return self._pop_due(now or self.clock())
+
+    def run_pending(self) -> int:
+        due = self.pop_due()
+        for reminder in due:
+            self.fire(reminder)
+        return len(due)
+
+    def fire(self, reminder):
+        try:
+            self.callback(reminder)
+        except Exception:
+            logger.exception("Reminder %r failed", reminder)
+
+    def start(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _in_memory(self, time):
+        if self.store is None:
+            return True
+        return self._loaded_until is not None and time <= self._loaded_until
+
+    def _push(self, reminder):
+        heapq.heappush(self._heap, (reminder.time, reminder.id, reminder))
+        self._pending.add(reminder.id)
+
+    def _load(self, now):
+        if self.store is None:
+            return
+        if self._loaded_until is not None and now + self.window / 2 < self._loaded_until:
+            return
+
+        until = now + self.window
+        for reminder in self.store.due_before(until, after=self._loaded_until):
+            self._push(reminder)
+        self._loaded_until = until
+
+    def _next_time(self):
+        while self._heap and self._heap[0][1] in self._cancelled:
+            _, reminder_id, _ = heapq.heappop(self._heap)
+            self._cancelled.discard(reminder_id)
+        if self._heap:
+            return self._heap[0][0]
+
+    def _pop_due(self, now) -> list:
+        self._load(now)
+        due = []
+        while True:
+            time = self._next_time()
+            if time is None or time > now:
+                return due
+            _, reminder_id, reminder = heapq.heappop(self._heap)
+            self._pending.remove(reminder_id)
+            if self.store:
+                self.store.remove(reminder_id)
+            due.append(reminder)
+
+            if reminder.rule:
+                time = next_occurrence(reminder, now)
+                if time is not None:
+                    self.add(reminder._replace(time=time, id=None))
+
+    def _timeout(self, now):
+        timeout = MAX_WAIT
+        time = self._next_time()
+        if time is not None:
+            timeout = min(timeout, (time - now).total_seconds())
+        if self._loaded_until is not None:
+            reload_time = self._loaded_until - self.window / 2
+            timeout = min(timeout, (reload_time - now).total_seconds())
+        return max(timeout, 0)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+
+                now = self.clock()
+                due = self._pop_due(now)
+                if not due:
+                    self._condition.wait(self._timeout(now))
+                    continue
+
+            for reminder in due:
+                self.fire(reminder)
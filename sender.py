@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Bot API: ~30 сообщений в секунду всего и ~1 в секунду в один чат.
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+# Длиннее Bot API отвечает BadRequest, и повтор не поможет.
+MAX_LENGTH = 4096
+
+Outgoing = namedtuple("Outgoing", "text, coalesce, enqueued, attempts")
+
+
+def split(text, length=MAX_LENGTH) -> list:
+    """Split text into parts of at most length characters, at whitespace if possible."""
+    parts = []
+    while len(text) > length:
+        cut = max(text.rfind("\n", 0, length + 1), text.rfind(" ", 0, length + 1))
+        if cut < length // 2:
+            cut = length
+        parts.append(text[:cut])
+        text = text[cut:].lstrip(" \n") if cut < length else text[cut:]
+    return parts + [text]
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available."""
+        self.refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.refill()
+        self.tokens -= 1
+
+
+class Sender:
+    """Outgoing message queue with rate limits, coalescing and retries.
+
+    Messages are queued per chat and sent in order, within a global and a
+    per-chat token bucket. Consecutive queued messages marked coalesce=True
+    (fired reminders) go out as one message. Failed sends are retried with
+    exponential backoff, or after the delay the Bot API asks for (RetryAfter).
+    """
+
+    def __init__(
+        self,
+        send,
+        global_rate=GLOBAL_RATE,
+        chat_rate=CHAT_RATE,
+        max_in_flight=8,
+        max_attempts=5,
+        backoff=1.0,
+        retryable=lambda error: True,
+        clock=time.monotonic,
+    ):
+        self.send = send
+        self.global_bucket = TokenBucket(global_rate, clock=clock)
+        self.chat_rate = chat_rate
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retryable = retryable
+        self.clock = clock
+        self.queues = {}
+        self.chat_buckets = OrderedDict()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=1000)
+        self._ready = []
+        self._order = itertools.count()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._busy = set()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "queued": self.queue_depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "latency_p50": latencies[len(latencies) // 2] if latencies else 0,
+            "latency_p99": latencies[int(len(latencies) * 0.99)] if latencies else 0,
+            "latency_max": latencies[-1] if latencies else 0,
+        }
+
+    def enqueue(self, chat_id, text, coalesce=False):
+        queue = self.queues.setdefault(chat_id, deque())
+        for part in split(text):
+            queue.append(Outgoing(part, coalesce, self.clock(), 0))
+        if len(queue) == 1 and chat_id not in self._busy:
+            # Очередь чата могла опустеть сразу после отправки: корзина всё ещё пуста.
+            self._schedule(chat_id, self.clock() + self._chat_bucket(chat_id).delay())
+        self._idle.clear()
+
+    def start(self):
+        self._task = asyncio.ensure_future(self.run())
+
+    async def join(self):
+        """Wait until every queued message has been sent or dropped."""
+        await self._idle.wait()
+
+    async def stop(self):
+        await self.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def run(self):
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            ready_time, _, chat_id = self._ready[0]
+            delay = max(ready_time - self.clock(), self.global_bucket.delay())
+            if delay > 0:
+                # Новое сообщение может оказаться готовым раньше.
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._ready)
+            await self._in_flight.acquire()
+            self.global_bucket.consume()
+            self._chat_bucket(chat_id).consume()
+            self._busy.add(chat_id)
+            asyncio.ensure_future(self._deliver(chat_id, self._take(chat_id)))
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chat_buckets.pop(chat_id, None)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, capacity=1, clock=self.clock)
+        self.chat_buckets[chat_id] = bucket
+        # Корзины давно молчащих чатов больше не ограничивают: их можно забыть.
+        while len(self.chat_buckets) > 10000:
+            self.chat_buckets.popitem(last=False)
+        return bucket
+
+    def _schedule(self, chat_id, ready_time):
+        heapq.heappush(self._ready, (ready_time, next(self._order), chat_id))
+        self._wakeup.set()
+
+    def _take(self, chat_id) -> list:
+        queue = self.queues[chat_id]
+        batch = [queue.popleft()]
+        if batch[0].coalesce:
+            length = len(batch[0].text)
+            # Склеенный текст тоже не длиннее MAX_LENGTH, с переводами строк.
+            while queue and queue[0].coalesce and length + 1 + len(queue[0].text) <= MAX_LENGTH:
+                length += 1 + len(queue[0].text)
+                batch.append(queue.popleft())
+        return batch
+
+    async def _deliver(self, chat_id, batch):
+        text = "\n".join(message.text for message in batch)
+        delay = 0
+        try:
+            await self.send(chat_id=chat_id, text=text)
+        except Exception as error:
+            delay = self._retry(chat_id, batch, error)
+        else:
+            now = self.clock()
+            self.sent += 1
+            self.latencies.extend(now - message.enqueued for message in batch)
+        finally:
+            self._in_flight.release()
+            self._busy.discard(chat_id)
+            self._next(chat_id, delay)
+
+    def _retry(self, chat_id, batch, error) -> float:
+        """Put batch back at the head of the chat's queue; return the retry delay."""
+        attempts = batch[0].attempts + 1
+        if attempts >= self.max_attempts or not self.retryable(error):
+            self.failed += 1
+            logger.warning("Dropping message to %s after %s attempts: %r", chat_id, attempts, error)
+            return 0
+
+        self.retries += 1
+        delay = getattr(error, "retry_after", None) or self.backoff * 2 ** (attempts - 1)
+        queue = self.queues[chat_id]
+        for message in reversed(batch):
+            queue.appendleft(message._replace(attempts=attempts))
+        logger.info("Retrying message to %s in %ss: %r", chat_id, delay, error)
+        return delay
+
+    def _next(self, chat_id, delay=0):
+        queue = self.queues[chat_id]
+        if queue:
+            delay = max(delay, self._chat_bucket(chat_id).delay())
+            self._schedule(chat_id, self.clock() + delay)
+        else:
+            del self.queues[chat_id]
+            if not self.queues and not self._busy:
+                self._idle.set()
@@ -0,0 +1,187 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import threading
+from collections import namedtuple
+
+from scheduler import Scheduler
+from storage import ReminderStore
+
+logger = logging.getLogger(__name__)
+
+
+def stable_hash(key) -> int:
+    # hash() строк случаен в каждом процессе, а кольцо должно совпадать везде.
+    return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing of chat ids onto shards.
+
+    Each shard owns replicas points on the ring; a chat belongs to the shard of
+    the first point after its hash. Adding or removing a shard moves only the
+    chats in that shard's arcs, about 1/N of all chats.
+    """
+
+    def __init__(self, shards, replicas=100):
+        self.shards = sorted(shards)
+        self.replicas = replicas
+        points = sorted(
+            (stable_hash(f"{shard}#{replica}"), shard)
+            for shard in self.shards
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, chat_id):
+        index = bisect.bisect(self._hashes, stable_hash(chat_id)) % len(self._hashes)
+        return self._owners[index]
+
+
+def run_shard(name, path, connection, outbox):
+    """Shard process: a scheduler over its own store, driven by commands from connection."""
+    store = ReminderStore(path)
+    scheduler = Scheduler(outbox.put, store=store)
+    scheduler.start()
+
+    def export(shards, replicas):
+        ring = HashRing(shards, replicas)
+        moved = []
+        for chat_id in store.chat_ids():
+            if ring.shard_for(chat_id) != name:
+                for reminder in store.for_chat(chat_id):
+                    scheduler.cancel(reminder.id)
+                    moved.append(reminder)
+        return moved
+
+    commands = {
+        "add": scheduler.add,
+        "cancel": scheduler.cancel,
+        "count": store.count,
+        "export": export,
+    }
+    try:
+        while True:
+            command, args = connection.recv()
+            if command == "stop":
+                break
+            try:
+                connection.send((True, commands[command](*args)))
+            except Exception as error:
+                connection.send((False, error))
+    finally:
+        scheduler.stop()
+        store.close()
+        connection.send((True, None))
+
+
+Shard = namedtuple("Shard", "process, connection, lock")
+
+
+class ShardedScheduler:
+    """Scheduler front end spreading chats over shard processes.
+
+    Each shard process owns a Scheduler and its own ReminderStore at
+    path_template.format(shard); chats are assigned to shards with a HashRing.
+    Fired reminders come back through a queue and are passed to callback in
+    this process, so Bot API sending stays in one place. Reminder ids are
+    (shard, id) pairs.
+
+    add_shard() and remove_shard() rebalance a running scheduler: reminders of
+    the chats that change owner are moved between shard stores.
+    """
+
+    def __init__(self, callback, path_template, shards=2, replicas=100):
+        self.callback = callback
+        self.path_template = path_template
+        self.ring = HashRing(range(shards), replicas)
+        self.shards = {}
+        # spawn, не fork: add_shard() запускает процессы, когда в этом процессе
+        # уже работают потоки (доставка, планировщик, пул ввода-вывода), и fork
+        # унёс бы в потомка захваченные ими блокировки.
+        self.context = multiprocessing.get_context("spawn")
+        self.outbox = self.context.Queue()
+        self._delivery = None
+
+    def start(self):
+        for name in self.ring.shards:
+            self._spawn(name)
+        self._delivery = threading.Thread(target=self._deliver, name="shards", daemon=True)
+        self._delivery.start()
+
+    def stop(self):
+        for name in list(self.shards):
+            self._stop_shard(name)
+        if self._delivery:
+            self.outbox.put(None)
+            self._delivery.join()
+            self._delivery = None
+
+    def add(self, reminder):
+        name = self.ring.shard_for(reminder.chat_id)
+        return name, self._call(name, "add", reminder)
+
+    def cancel(self, reminder_id):
+        name, local_id = reminder_id
+        self._call(name, "cancel", local_id)
+
+    def count(self) -> int:
+        return sum(self._call(name, "count") for name in self.shards)
+
+    def add_shard(self):
+        name = max(self.shards) + 1
+        self._spawn(name)
+        self._rebalance(HashRing(self.ring.shards + [name], self.ring.replicas))
+        return name
+
+    def remove_shard(self, name):
+        shards = [shard for shard in self.ring.shards if shard != name]
+        self._rebalance(HashRing(shards, self.ring.replicas))
+        self._stop_shard(name)
+
+    def _rebalance(self, ring):
+        # Новые напоминания сразу идут к новым владельцам, старые переносим.
+        self.ring = ring
+        moved = 0
+        for name in list(self.shards):
+            for reminder in self._call(name, "export", ring.shards, ring.replicas):
+                self.add(reminder._replace(id=None))
+                moved += 1
+        logger.info("Rebalanced onto shards %s, moved %s reminders", ring.shards, moved)
+
+    def _spawn(self, name):
+        connection, child = self.context.Pipe()
+        path = self.path_template.format(name)
+        process = self.context.Process(
+            target=run_shard, args=(name, path, child, self.outbox), name=f"shard-{name}"
+        )
+        process.start()
+        self.shards[name] = Shard(process, connection, threading.Lock())
+
+    def _stop_shard(self, name):
+        shard = self.shards.pop(name)
+        with shard.lock:
+            shard.connection.send(("stop", ()))
+            shard.connection.recv()
+        shard.process.join()
+
+    def _call(self, name, command, *args):
+        shard = self.shards[name]
+        with shard.lock:
+            shard.connection.send((command, args))
+            ok, result = shard.connection.recv()
+        if not ok:
+            raise result
+        return result
+
+    def _deliver(self):
+        while True:
+            reminder = self.outbox.get()
+            if reminder is None:
+                return
+            try:
+                self.callback(reminder)
+            except Exception:
+                logger.exception("Reminder %r failed", reminder)
@@ -0,0 +1,190 @@
+import datetime as dt
+import itertools
+import sqlite3
+import threading
+from typing import Optional
+
+from scheduler import Reminder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY,
+    due_time TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    rule TEXT,
+    timezone TEXT
+);
+CREATE INDEX IF NOT EXISTS reminders_due_time ON reminders (due_time, chat_id);
+CREATE INDEX IF NOT EXISTS reminders_chat_id ON reminders (chat_id, due_time);
+CREATE TABLE IF NOT EXISTS chats (
+    chat_id INTEGER PRIMARY KEY,
+    timezone TEXT
+);
+"""
+
+INSERT = (
+    "INSERT INTO reminders (id, due_time, chat_id, task, rule, timezone) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+DELETE = "DELETE FROM reminders WHERE id = ?"
+SELECT = "SELECT id, due_time, chat_id, task, rule, timezone FROM reminders"
+SET_TIMEZONE = "INSERT OR REPLACE INTO chats (chat_id, timezone) VALUES (?, ?)"
+
+
+# Фиксированная точность, чтобы строки сравнивались так же, как даты.
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def to_db(time):
+    return time.strftime(TIME_FORMAT)
+
+
+def local_to_utc(time):
+    # timestamp() читает наивное время как местное время сервера, с его переходами на летнее.
+    return dt.datetime.utcfromtimestamp(time.timestamp())
+
+
+def from_db(row):
+    id, due_time, chat_id, task, rule, timezone = row
+    time = dt.datetime.strptime(due_time, TIME_FORMAT)
+    return Reminder(time, chat_id, task, id, rule, timezone)
+
+
+class ReminderStore:
+    """SQLite reminder storage in WAL mode.
+
+    Writes are buffered and committed in batches: when batch_size operations
+    are pending, or flush_interval seconds after the first pending one.
+    Reads flush the buffer first, so they always see every accepted write.
+
+    Chat timezones are kept here too, and cached in memory once read.
+    """
+
+    def __init__(self, path, batch_size=100, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+
+        (last_id,) = self.connection.execute("SELECT MAX(id) FROM reminders").fetchone()
+        self._ids = itertools.count((last_id or 0) + 1)
+        self._pending = []
+        self._timer = None
+        self._timezones = {}
+        self._lock = threading.RLock()
+
+    def migrate(self):
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(reminders)")}
+        for column in ("rule", "timezone"):
+            if column not in columns:
+                with self.connection:
+                    self.connection.execute(f"ALTER TABLE reminders ADD COLUMN {column} TEXT")
+        if "timezone" not in columns:
+            self.migrate_to_utc()
+
+    def migrate_to_utc(self):
+        # До часовых поясов планировщик жил по местному времени сервера.
+        rows = self.connection.execute("SELECT id, due_time FROM reminders").fetchall()
+        with self.connection:
+            for id, due_time in rows:
+                time = local_to_utc(dt.datetime.strptime(due_time, TIME_FORMAT))
+                self.connection.execute(
+                    "UPDATE reminders SET due_time = ? WHERE id = ?", (to_db(time), id)
+                )
+
+    def add(self, reminder) -> Reminder:
+        """Queue reminder for insertion and return it with a fresh id."""
+        with self._lock:
+            reminder = reminder._replace(id=next(self._ids))
+            params = (
+                reminder.id,
+                to_db(reminder.time),
+                reminder.chat_id,
+                reminder.task,
+                reminder.rule,
+                reminder.timezone,
+            )
+            self._write(INSERT, params)
+            return reminder
+
+    def remove(self, reminder_id):
+        with self._lock:
+            self._write(DELETE, (reminder_id,))
+
+    def set_timezone(self, chat_id, timezone):
+        with self._lock:
+            self._timezones[chat_id] = timezone
+            self._write(SET_TIMEZONE, (chat_id, timezone))
+
+    def get_timezone(self, chat_id) -> Optional[str]:
+        with self._lock:
+            if chat_id not in self._timezones:
+                self.flush()
+                row = self.connection.execute(
+                    "SELECT timezone FROM chats WHERE chat_id = ?", (chat_id,)
+                ).fetchone()
+                self._timezones[chat_id] = row and row[0]
+            return self._timezones[chat_id]
+
+    def flush(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            with self.connection:
+                for sql, params in self._pending:
+                    self.connection.execute(sql, params)
+            self._pending = []
+
+    def due_before(self, until, after=None, limit=None) -> list:
+        """Return reminders with after < time <= until, earliest first."""
+        sql = f"{SELECT} WHERE due_time <= ?"
+        params = [to_db(until)]
+        if after is not None:
+            sql += " AND due_time > ?"
+            params.append(to_db(after))
+        sql += " ORDER BY due_time, chat_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._select(sql, params)
+
+    def for_chat(self, chat_id) -> list:
+        return self._select(f"{SELECT} WHERE chat_id = ? ORDER BY due_time", [chat_id])
+
+    def chat_ids(self) -> list:
+        with self._lock:
+            self.flush()
+            rows = self.connection.execute("SELECT DISTINCT chat_id FROM reminders")
+            return [chat_id for (chat_id,) in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            self.flush()
+            (count,) = self.connection.execute("SELECT COUNT(*) FROM reminders").fetchone()
+            return count
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self.connection.close()
+
+    def _select(self, sql, params) -> list:
+        with self._lock:
+            self.flush()
+            return [from_db(row) for row in self.connection.execute(sql, params)]
+
+    def _write(self, sql, params):
+        self._pending.append((sql, params))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
@@ -0,0 +1,43 @@
+from bench import compare, corpus, measure
+
+
+def test_compare():
+    baseline = {
+        "rule.DAY.count": 20,
+        "rule.DAY.p99": 100.0,
+        "rule.DAY.throughput": 1000.0,
+        "rule.EVERY_DATE.count": 3,
+        "rule.EVERY_DATE.p99": 100.0,
+        "memory.peak_kib": 1000.0,
+    }
+    metrics = {
+        "rule.DAY.count": 20,
+        "rule.DAY.p99": 120.0,
+        "rule.DAY.throughput": 700.0,
+        "rule.EVERY_DATE.count": 3,
+        "rule.EVERY_DATE.p99": 900.0,
+        "memory.peak_kib": 1500.0,
+    }
+
+    assert compare(metrics, baseline) == [
+        "memory.peak_kib: 1000.0 -> 1500.0 (+50% worse)",
+        "rule.DAY.throughput: 1000.0 -> 700.0 (+43% worse)",
+    ]
+    assert compare(metrics, baseline, tolerance=0.5) == []
+    assert compare(baseline, baseline) == []
+
+
+def test_measure():
+    strings = ["завтра в 10 позвонить", "каждый день в 9", "купить хлеба"]
+    metrics = measure(strings, repeat=1)
+
+    assert metrics["rule.total.count"] == 3
+    assert metrics["rule.prefiltered.count"] == 1
+    assert set(metrics) >= {
+        "stage.tokenize",
+        "stage.parse",
+        "stage.interpret",
+        "stage.get_datetime",
+        "memory.peak_kib",
+    }
+    assert len(corpus()) > 200
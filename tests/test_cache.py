@@ -0,0 +1,65 @@
+import datetime as dt
+
+from exact_time import LRUCache, extractor, get_parser, morph_cache, parse_cache
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" becomes least recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+        "size": 2,
+        "maxsize": 2,
+        "hit_rate": 2 / 3,
+    }
+
+
+def test_cached_parse_is_resolved_against_each_moment():
+    parse_cache.clear()
+    first = extractor("позвонить маме вечером", moment=dt.datetime(2018, 1, 1, 12, 0))
+    second = extractor("позвонить маме вечером", moment=dt.datetime(2018, 1, 2, 12, 0))
+
+    assert first.time == dt.datetime(2018, 1, 1, 19, 0)
+    assert second.time == dt.datetime(2018, 1, 2, 19, 0)
+    assert parse_cache.hits == 1
+
+
+def test_cached_fact_is_not_mutated():
+    parse_cache.clear()
+    moment = dt.datetime(2018, 1, 1, 12, 0)
+    first = extractor("завтра в налоговую в 10 часов", moment=moment)
+    second = extractor("завтра в налоговую в 10 часов", moment=moment)
+    plain = extractor("в налоговую в 10 часов", moment=moment)
+
+    assert first == second
+    assert first.time == dt.datetime(2018, 1, 2, 10, 0)
+    assert plain.time == dt.datetime(2018, 1, 1, 22, 0)
+
+
+def test_morph_results_are_shared_between_messages():
+    parser = get_parser()
+    morph_cache.clear()
+    list(parser.findall("позвонить маме Завтра вечером"))
+    assert morph_cache.stats()["misses"] == 4
+
+    list(parser.findall("завтра вечером в магазин"))
+    assert morph_cache.hits == 2
+    assert morph_cache.misses == 6
+
+
+def test_cached_parse_is_replayed_against_a_later_moment():
+    parse_cache.clear()
+    first = extractor("23 мая в 15-10 на почту", moment=dt.datetime(2018, 1, 1, 12, 0))
+    later = extractor("23 мая в 15-10 на почту", moment=dt.datetime(2020, 1, 1, 12, 0))
+
+    assert first.time == dt.datetime(2019, 5, 23, 15, 10)
+    assert later.time == dt.datetime(2021, 5, 23, 15, 10)
+    assert parse_cache.hits == 1
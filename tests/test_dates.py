@@ -5,3 +5,39 @@
 # "2 часа",
 # "2 часа 20 минут",
 # "20:59",
+import datetime as dt
+import random
+
+import pytest
+from dateutil import rrule
+
+from exact_time import DayEnum
+
+
+def rrule_get_date(day, current):
+    """Previous DayEnum.get_date implementation for weekdays, kept as the reference."""
+    r_rule = iter(
+        rrule.rrule(rrule.DAILY, dtstart=current, byweekday=rrule.weekdays[day - 1], count=2)
+    )
+    next_date = next(r_rule)
+    if next_date.date() == current.date():
+        return next(r_rule)
+    return next_date
+
+
+def reference_dates():
+    start = dt.datetime(2018, 1, 1)
+    for hours in range(0, 24 * 7 * 3, 5):
+        yield start + dt.timedelta(hours=hours)
+
+    rnd = random.Random(2018)
+    for _ in range(500):
+        yield dt.datetime(2000, 1, 1) + dt.timedelta(
+            days=rnd.randrange(365 * 100), seconds=rnd.randrange(24 * 60 * 60)
+        )
+
+
+@pytest.mark.parametrize("day", [day for day in DayEnum if day <= DayEnum.SUNDAY])
+def test_weekday_matches_rrule(day):
+    for current in reference_dates():
+        assert day.get_date(current) == rrule_get_date(day, current), current
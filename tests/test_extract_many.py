@@ -0,0 +1,22 @@
+import datetime as dt
+
+from cases import cases
+from exact_time import extract_many, extractor
+
+moment = dt.datetime(2018, 1, 1, 12, 0)
+
+
+def test_extract_many_matches_extractor():
+    assert list(extract_many(cases, moment)) == [extractor(case, moment) for case in cases]
+
+
+def test_extract_many_process_pool():
+    expected = [extractor(case, moment) for case in cases]
+    result = list(extract_many(iter(cases), moment, processes=2, chunksize=8))
+
+    assert len(result) == len(expected)
+    for extract, expected_extract in zip(result, expected):
+        if expected_extract is None:
+            assert extract is None
+        else:
+            assert extract == expected_extract._replace(match=None)
@@ -0,0 +1,34 @@
+import datetime as dt
+
+import pytest
+
+from formatting import day_boundaries, human_format
+
+# Понедельник.
+now = dt.datetime(2018, 1, 1, 12, 0)
+
+cases = [
+    (dt.datetime(2018, 1, 1, 19, 0), "сегодня в 19"),
+    (dt.datetime(2018, 1, 2, 10, 5), "завтра в 10:05"),
+    (dt.datetime(2018, 1, 3, 9, 30), "послезавтра (среда) в 9:30"),
+    (dt.datetime(2018, 1, 4, 9, 0), "в этот четверг в 9"),
+    (dt.datetime(2018, 1, 5, 9, 0), "в эту пятницу в 9"),
+    (dt.datetime(2018, 1, 7, 9, 0), "в это воскресенье в 9"),
+    (dt.datetime(2018, 1, 8, 9, 0), "8 января в 9"),
+    (dt.datetime(2019, 5, 23, 15, 10), "23 мая 2019 в 15:10"),
+]
+
+
+@pytest.mark.parametrize("moment, expected", cases)
+def test_human_format(moment, expected):
+    assert human_format(moment, now) == expected
+
+
+def test_day_boundaries_are_computed_once_per_day():
+    day_boundaries.cache_clear()
+    for minute in range(100):
+        human_format(now, now + dt.timedelta(minutes=minute))
+    human_format(now, now + dt.timedelta(days=1))
+
+    info = day_boundaries.cache_info()
+    assert (info.misses, info.hits) == (2, 99)
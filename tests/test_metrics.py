@@ -0,0 +1,115 @@
+import asyncio
+import http.client
+import threading
+import time
+
+from metrics import Counter, Gauge, Histogram, MetricsServer, Registry, SamplingProfiler
+from tests.test_runtime import FakeBot, run
+
+
+def test_render():
+    registry = Registry()
+    handled = registry.register(Counter("handled_total", "Handled."))
+    seconds = registry.register(Histogram("seconds", "Time.", buckets=(0.1, 1)))
+    registry.register(Gauge("ratio", "Ratio.", lambda: {(("cache", 'a"b'),): 0.5}))
+
+    handled.inc(handler="start")
+    handled.inc(2, handler="start")
+    seconds.observe(0.05, handler="start")
+    seconds.observe(0.5, handler="start")
+
+    assert registry.render() == "\n".join(
+        [
+            "# HELP handled_total Handled.",
+            "# TYPE handled_total counter",
+            'handled_total{handler="start"} 3',
+            "# HELP ratio Ratio.",
+            "# TYPE ratio gauge",
+            'ratio{cache="a\\"b"} 0.5',
+            "# HELP seconds Time.",
+            "# TYPE seconds histogram",
+            'seconds_bucket{handler="start",le="0.1"} 1',
+            'seconds_bucket{handler="start",le="1"} 2',
+            'seconds_bucket{handler="start",le="+Inf"} 2',
+            'seconds_sum{handler="start"} 0.55',
+            'seconds_count{handler="start"} 2',
+            "",
+        ]
+    )
+
+
+def get(port, path):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    connection.request("GET", path)
+    response = connection.getresponse()
+    body = response.read().decode()
+    connection.close()
+    return response.status, body
+
+
+def test_runtime_metrics_endpoint():
+    async def print_exact_time(runtime, update):
+        extract = await runtime.parse(update.message.text)
+        text = extract.time_string if extract else "?"
+        await runtime.send_message(chat_id=update.message.chat_id, text=text)
+
+    bot = FakeBot([(1, "позвонить завтра в 10"), (1, "купить хлеба")])
+    runtime = run(bot, lambda update: print_exact_time)
+    server = MetricsServer(host="127.0.0.1", port=0)
+
+    async def scrape():
+        await server.start()
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, get, server.port, "/metrics")
+        finally:
+            await server.stop()
+
+    status, body = asyncio.get_event_loop().run_until_complete(scrape())
+    assert status == 200
+    assert 'bot_handler_seconds_count{handler="print_exact_time"}' in body
+    assert 'bot_parse_seconds_count{alternative="DAY_AT_TIME"}' in body
+    assert 'bot_parses_total{result="failure"}' in body
+    assert "bot_send_queue_depth 0" in body
+    assert 'bot_cache_hit_ratio{cache="morph"}' in body
+    assert runtime.sender.sent == 2
+
+
+def test_profiler_endpoint_is_opt_in():
+    async def requests(server, paths):
+        await server.start()
+        loop = asyncio.get_event_loop()
+        try:
+            results = []
+            for path in paths:
+                results.append(await loop.run_in_executor(None, get, server.port, path))
+                await asyncio.sleep(0.1)
+            return results
+        finally:
+            await server.stop()
+
+    loop = asyncio.get_event_loop()
+    plain = MetricsServer(Registry(), host="127.0.0.1", port=0)
+    [(status, _)] = loop.run_until_complete(requests(plain, ["/profile/start"]))
+    assert status == 404
+
+    stop = threading.Event()
+
+    def busy_loop_for_profiler():
+        while not stop.is_set():
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=busy_loop_for_profiler)
+    thread.start()
+    profiled = MetricsServer(Registry(), SamplingProfiler(interval=0.005), "127.0.0.1", 0)
+    try:
+        started, stopped = loop.run_until_complete(
+            requests(profiled, ["/profile/start", "/profile/stop"])
+        )
+    finally:
+        stop.set()
+        thread.join()
+
+    assert started == (200, "started\n")
+    assert stopped[0] == 200
+    assert "busy_loop_for_profiler" in stopped[1]
@@ -0,0 +1,63 @@
+import random
+from collections import Counter
+
+from phrases import PhraseCounter, UnrecognizedPhrases, normalize
+
+
+def test_counts_exactly_below_capacity():
+    counter = PhraseCounter(capacity=10)
+    for phrase in ["а", "б", "а", "в", "а", "б"]:
+        counter.add(phrase)
+
+    assert counter.top() == [("а", 3, 0), ("б", 2, 0), ("в", 1, 0)]
+    assert counter.top(offset=1, limit=1) == [("б", 2, 0)]
+
+
+def test_memory_is_bounded_and_heavy_hitters_survive():
+    rng = random.Random(0)
+    stream = [f"частая {index}" for index in range(5) for _ in range(200)]
+    stream += [f"редкая {index}" for index in range(5000)]
+    rng.shuffle(stream)
+
+    counter = PhraseCounter(capacity=50)
+    for phrase in stream:
+        counter.add(phrase)
+
+    assert len(counter) == 50
+    top = counter.top(limit=5)
+    assert sorted(phrase for phrase, _, _ in top) == [f"частая {index}" for index in range(5)]
+    for phrase, count, error in counter.top():
+        true_count = Counter(stream)[phrase]
+        assert count - error <= true_count <= count
+
+
+def test_min_bucket_is_tracked():
+    counter = PhraseCounter(capacity=2)
+    counter.add("а")
+    counter.add("а")
+    counter.add("б")
+    counter.add("б")
+    counter.add("б")
+    counter.add("в")
+
+    # Вытеснена «а» с минимальным счётчиком 2.
+    assert counter.top() == [("б", 3, 0), ("в", 3, 2)]
+
+
+def test_normalize():
+    assert normalize("  Сходить   В магазин ") == "сходить в магазин"
+    assert len(normalize("а" * 1000)) == 200
+
+
+def test_persists_across_restarts(tmp_path):
+    path = str(tmp_path / "bot.sqlite3")
+    phrases = UnrecognizedPhrases(path)
+    for phrase in ["когда-нибудь", "Когда-нибудь", "потом"]:
+        phrases.add(phrase)
+    phrases.close()
+
+    phrases = UnrecognizedPhrases(path)
+    assert phrases.page(1) == [("когда-нибудь", 2, 0), ("потом", 1, 0)]
+    assert phrases.page(2, size=1) == [("потом", 1, 0)]
+    assert phrases.page(2) == []
+    phrases.close()
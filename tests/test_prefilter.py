@@ -0,0 +1,27 @@
+import pytest
+
+from cases import cases
+from exact_time import extractor, get_parser, may_contain_time
+from tests.test_times import cases as time_cases
+
+phrases = cases + [case for case, _, _ in time_cases]
+
+
+@pytest.mark.parametrize("phrase", phrases)
+def test_no_false_negatives(phrase):
+    if next(get_parser().findall(phrase), None) is not None:
+        assert may_contain_time(phrase)
+
+
+@pytest.mark.parametrize(
+    "phrase",
+    ["привет", "как дела?", "купить молоко и хлеб", "ok, thanks", "12345", ""],
+)
+def test_rejects_messages_without_temporal_words(phrase):
+    assert not may_contain_time(phrase)
+    assert extractor(phrase) is None
+
+
+@pytest.mark.parametrize("phrase", ["Завтра", "ВЕЧЕРОМ", "в пятницу", "днем", "через 5 минут"])
+def test_accepts_temporal_words(phrase):
+    assert may_contain_time(phrase)
@@ -0,0 +1,74 @@
+import datetime as dt
+
+import pytest
+from dateutil import rrule
+
+from exact_time import extractor
+
+moment = dt.datetime(2018, 1, 1, 12, 0)  # понедельник
+
+cases = [
+    (
+        "проверять пирог каждые 10 минут",
+        "каждые 10 минут",
+        [dt.datetime(2018, 1, 1, 12, 10), dt.datetime(2018, 1, 1, 12, 20)],
+    ),
+    (
+        "платить за интернет каждое 1 число месяца",
+        "каждое 1 число месяца",
+        [dt.datetime(2018, 2, 1, 9, 0), dt.datetime(2018, 3, 1, 9, 0)],
+    ),
+    (
+        "поливать цветы каждый второй понедельник",
+        "каждый второй понедельник",
+        [dt.datetime(2018, 1, 15, 9, 0), dt.datetime(2018, 1, 29, 9, 0)],
+    ),
+    (
+        "погладить рубашку на завтра каждое воскресение в 19:00",
+        "каждое воскресение в 19:00",
+        [dt.datetime(2018, 1, 7, 19, 0), dt.datetime(2018, 1, 14, 19, 0)],
+    ),
+    (
+        "каждый день в 18 домой",
+        "каждый день в 18",
+        [dt.datetime(2018, 1, 1, 18, 0), dt.datetime(2018, 1, 2, 18, 0)],
+    ),
+    (
+        "каждую среду в 17-30 на тренировку",
+        "каждую среду в 17-30",
+        [dt.datetime(2018, 1, 3, 17, 30), dt.datetime(2018, 1, 10, 17, 30)],
+    ),
+    (
+        "каждое 30 мая подарок на годовщину",
+        "каждое 30 мая",
+        [dt.datetime(2018, 5, 30, 9, 0), dt.datetime(2019, 5, 30, 9, 0)],
+    ),
+    ("каждое утро", "каждое утро", [dt.datetime(2018, 1, 2, 9, 0), dt.datetime(2018, 1, 3, 9, 0)]),
+    (
+        "каждым утром",
+        "каждым утром",
+        [dt.datetime(2018, 1, 2, 9, 0), dt.datetime(2018, 1, 3, 9, 0)],
+    ),
+    (
+        "каждый вечер в 8",
+        "каждый вечер в 8",
+        [dt.datetime(2018, 1, 1, 20, 0), dt.datetime(2018, 1, 2, 20, 0)],
+    ),
+    ("каждый день", "каждый день", [dt.datetime(2018, 1, 2, 9, 0), dt.datetime(2018, 1, 3, 9, 0)]),
+]
+
+
+@pytest.mark.parametrize("case, case_time, occurrences", cases)
+def test_recurrence(case, case_time, occurrences):
+    extract = extractor(case, moment=moment)
+    assert extract is not None
+    assert case_time == extract.time_string
+    assert occurrences[0] == extract.time
+
+    rule = rrule.rrulestr(extract.rule)
+    assert occurrences == [rule.after(moment), rule.after(occurrences[0])]
+
+
+@pytest.mark.parametrize("case", ["каждое 30 февраля", "каждое 31 апреля в 10"])
+def test_rule_without_occurrences_is_not_extracted(case):
+    assert extractor(case, moment=moment) is None
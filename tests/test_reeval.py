@@ -0,0 +1,93 @@
+import json
+
+from reeval import diff, main
+
+
+def write_lines(path, lines):
+    path.write_text("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines))
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_diff():
+    old = {"text": "а", "time_string": "в 10", "task": "а", "time": "2018-01-01 22:00"}
+    assert diff(old, dict(old)) == {}
+    assert diff(old, dict(old, time="2018-01-02 10:00")) == {
+        "time": ["2018-01-01 22:00", "2018-01-02 10:00"]
+    }
+    assert diff(old, {"text": "а"}) == {"unrecognized": ["в 10", None]}
+    assert diff({"text": "а"}, old) == {"recognized": [None, "в 10"]}
+    assert diff({"text": "а", "error": "KeyError(16)"}, old) == {"error": ["KeyError(16)", None]}
+    assert diff(old, dict(old, past=True)) == {"past": [None, True]}
+
+
+def test_reevaluates_and_diffs_against_previous_run(tmp_path, capsys):
+    corpus = tmp_path / "messages.jsonl"
+    write_lines(
+        corpus,
+        [
+            {"text": "позвонить завтра в 10"},
+            {"text": "купить хлеба"},
+            {"text": "полить цветы через 2 часа"},
+        ],
+    )
+    output = tmp_path / "run.jsonl"
+    args = [str(corpus), "--output", str(output), "--processes", "1"]
+
+    assert main(args) == 0
+    first = read_lines(output)
+    times = [record.get("time") for record in first]
+    assert times == ["2018-01-02 10:00", None, "2018-01-01 14:00"]
+    assert first[0]["alternative"] == "DAY_AT_TIME"
+
+    # Прошлый прогон «знал» вторую фразу и не знал третью.
+    first[1] = {"text": "купить хлеба", "time_string": "хлеба", "time": "2018-01-01 12:00"}
+    first[2] = {"text": "полить цветы через 2 часа"}
+    write_lines(output, first)
+    diff_path = tmp_path / "diff.jsonl"
+    args += ["--moment", "2018-01-02 12:00", "--previous", str(output), "--diff", str(diff_path)]
+    assert main(args) == 0
+
+    assert read_lines(diff_path) == [
+        {
+            "line": 1,
+            "text": "позвонить завтра в 10",
+            "changes": {"time": ["2018-01-02 10:00", "2018-01-03 10:00"]},
+        },
+        {"line": 2, "text": "купить хлеба", "changes": {"unrecognized": ["хлеба", None]}},
+        {
+            "line": 3,
+            "text": "полить цветы через 2 часа",
+            "changes": {"recognized": [None, "через 2 часа"]},
+        },
+    ]
+    assert read_lines(output)[0]["time"] == "2018-01-03 10:00"
+    out = capsys.readouterr().out
+    assert "recognized: 2\nerrors: 0\nchanged: 3\n" in out
+    assert "  recognized: 1\n" in out
+
+
+def test_failing_messages_are_recorded_and_the_run_goes_on(tmp_path, monkeypatch, capsys):
+    import reeval
+
+    def extractor(text, moment):
+        if text == "сломать":
+            raise ValueError("hour must be in 0..23")
+        return real_extractor(text, moment)
+
+    real_extractor = reeval.extractor
+    monkeypatch.setattr(reeval, "extractor", extractor)
+    corpus = tmp_path / "messages.jsonl"
+    write_lines(corpus, [{"text": "сломать"}, {"text": "позвонить завтра в 10"}])
+    output = tmp_path / "run.jsonl"
+
+    # Пул процессов наследует подменённый extractor при fork.
+    assert main([str(corpus), "--output", str(output), "--processes", "2"]) == 0
+
+    first, second = read_lines(output)
+    assert first == {"text": "сломать", "error": "ValueError('hour must be in 0..23')"}
+    assert second["time"] == "2018-01-02 10:00"
+    assert "errors: 1" in capsys.readouterr().out
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["messages.jsonl", "run.jsonl"]
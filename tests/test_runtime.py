@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+from collections import namedtuple
+
+from exact_time import parse_cache
+from runtime import Runtime, combine_stats
+
+Update = namedtuple("Update", "update_id, message")
+Message = namedtuple("Message", "chat_id, text")
+
+
+class FakeBot:
+    def __init__(self, messages):
+        self.updates = [
+            Update(update_id, Message(chat_id, text))
+            for update_id, (chat_id, text) in enumerate(messages, 1)
+        ]
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def get_updates(self, offset=None, timeout=0):
+        updates = [update for update in self.updates if update.update_id >= (offset or 0)]
+        if not updates:
+            time.sleep(0.01)
+        return updates[:10]
+
+    def send_message(self, chat_id, text):
+        with self.lock:
+            self.sent.append((chat_id, text))
+
+
+def run(bot, route, **kwargs):
+    runtime = Runtime(bot, route, poll_timeout=0, send_options={"chat_rate": 1000}, **kwargs)
+
+    async def main():
+        await runtime.start()
+        poll = asyncio.ensure_future(runtime.poll())
+        while runtime.offset != len(bot.updates) + 1:
+            await asyncio.sleep(0.01)
+        runtime.stop()
+        await poll
+        await runtime.shutdown()
+
+    asyncio.get_event_loop().run_until_complete(main())
+    return runtime
+
+
+async def echo(runtime, update):
+    if update.message.text == "медленно":
+        await asyncio.sleep(0.2)
+    await runtime.send_message(chat_id=update.message.chat_id, text=update.message.text)
+
+
+def test_chat_order_is_preserved_and_slow_chats_do_not_block_others():
+    messages = [(1, "медленно"), (2, "быстро")] + [(1, str(index)) for index in range(20)]
+    bot = FakeBot(messages)
+    run(bot, lambda update: echo, workers=2, queue_size=2)
+
+    assert sorted(bot.sent) == sorted(messages)
+    assert [text for chat_id, text in bot.sent if chat_id == 1] == ["медленно"] + [
+        str(index) for index in range(20)
+    ]
+    assert bot.sent.index((2, "быстро")) < bot.sent.index((1, "медленно"))
+
+
+def test_parse_runs_in_executor_and_errors_are_contained():
+    async def handler(runtime, update):
+        if update.message.text == "ошибка":
+            raise RuntimeError
+        extract = await runtime.parse(update.message.text)
+        await runtime.send_message(chat_id=update.message.chat_id, text=extract.time_string)
+
+    bot = FakeBot([(1, "ошибка"), (1, "позвонить через 20 минут")])
+    run(bot, lambda update: handler)
+    assert bot.sent == [(1, "через 20 минут")]
+
+
+def test_cache_stats_come_from_parsing_processes():
+    async def handler(runtime, update):
+        await runtime.parse(update.message.text)
+
+    parse_cache.clear()
+    messages = [(1, "позвонить через 20 минут"), (2, "купить хлеба в 10"), (3, "в 10 спать")]
+    runtime = run(FakeBot(messages), lambda update: handler, parse_processes=2)
+
+    # Главный процесс ничего не разбирал: размер кеша набран в процессах пула.
+    assert len(parse_cache) == 0
+    assert runtime.cache_stats("size")[(("cache", "parse"),)] >= len(messages)
+
+
+def test_combine_stats():
+    def stats(hits, misses, size):
+        return {"hits": hits, "misses": misses, "evictions": 0, "size": size}
+
+    snapshots = {
+        1: {"parse": stats(3, 1, 4), "morph": stats(0, 0, 0)},
+        2: {"parse": stats(1, 3, 4), "morph": stats(5, 5, 10)},
+    }
+    combined = combine_stats(snapshots)
+    assert combined["parse"]["size"] == 8
+    assert combined["parse"]["hit_rate"] == 0.5
+    assert combined["morph"]["hit_rate"] == 0.5
+    assert combine_stats({})["parse"]["hit_rate"] == 0.0
@@ -0,0 +1,100 @@
+import datetime as dt
+import threading
+
+from scheduler import Reminder, Scheduler
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += dt.timedelta(**kwargs)
+
+
+def test_fires_due_reminders_in_time_order():
+    clock = FakeClock(dt.datetime(2018, 1, 1, 12, 0))
+    fired = []
+    scheduler = Scheduler(fired.append, clock=clock)
+
+    later = Reminder(dt.datetime(2018, 1, 1, 12, 30), 1, "позвонить")
+    sooner = Reminder(dt.datetime(2018, 1, 1, 12, 10), 2, "написать")
+    tomorrow = Reminder(dt.datetime(2018, 1, 2, 9, 0), 1, "проснуться")
+    for reminder in (later, tomorrow, sooner):
+        scheduler.add(reminder)
+
+    assert scheduler.run_pending() == 0
+    assert scheduler.next_time() == sooner.time
+
+    clock.advance(minutes=30)
+    assert scheduler.run_pending() == 2
+    assert [reminder.task for reminder in fired] == [sooner.task, later.task]
+    assert len(scheduler) == 1
+
+
+def test_cancel():
+    clock = FakeClock(dt.datetime(2018, 1, 1, 12, 0))
+    fired = []
+    scheduler = Scheduler(fired.append, clock=clock)
+
+    key = scheduler.add(Reminder(dt.datetime(2018, 1, 1, 12, 10), 1, "позвонить"))
+    scheduler.cancel(key)
+    scheduler.cancel(key)
+
+    clock.advance(hours=1)
+    assert scheduler.run_pending() == 0
+    assert scheduler.next_time() is None
+    assert len(scheduler) == 0
+    assert fired == []
+
+
+def test_failing_callback_does_not_stop_other_reminders():
+    clock = FakeClock(dt.datetime(2018, 1, 1, 12, 0))
+    fired = []
+
+    def callback(reminder):
+        if reminder.chat_id == 1:
+            raise RuntimeError
+        fired.append(reminder)
+
+    scheduler = Scheduler(callback, clock=clock)
+    scheduler.add(Reminder(clock.now, 1, "ошибка"))
+    scheduler.add(Reminder(clock.now, 2, "позвонить"))
+
+    assert scheduler.run_pending() == 2
+    assert [reminder.chat_id for reminder in fired] == [2]
+
+
+def test_worker_thread_wakes_up_for_earlier_reminder():
+    fired = threading.Event()
+    scheduler = Scheduler(lambda reminder: fired.set())
+    scheduler.add(Reminder(dt.datetime.utcnow() + dt.timedelta(hours=1), 1, "потом"))
+    scheduler.start()
+    try:
+        scheduler.add(Reminder(dt.datetime.utcnow() + dt.timedelta(milliseconds=50), 1, "сейчас"))
+        assert fired.wait(timeout=5)
+    finally:
+        scheduler.stop()
+    assert len(scheduler) == 1
+
+
+def test_recurring_reminder_is_rescheduled():
+    clock = FakeClock(dt.datetime(2018, 1, 1, 12, 0))
+    fired = []
+    scheduler = Scheduler(fired.append, clock=clock)
+    rule = "DTSTART:20180101T120000\nRRULE:FREQ=MINUTELY;INTERVAL=10"
+    scheduler.add(Reminder(dt.datetime(2018, 1, 1, 12, 10), 1, "проверить пирог", rule=rule))
+
+    clock.advance(minutes=10)
+    assert scheduler.run_pending() == 1
+    assert scheduler.next_time() == dt.datetime(2018, 1, 1, 12, 20)
+
+    # Пропущенные срабатывания не догоняются, следующее — после текущего момента.
+    clock.advance(minutes=35)
+    assert scheduler.run_pending() == 1
+    assert scheduler.next_time() == dt.datetime(2018, 1, 1, 12, 50)
+    assert len(fired) == 2
+    assert len(scheduler) == 1
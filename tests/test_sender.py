@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+from sender import MAX_LENGTH, Sender, TokenBucket, split
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyBot:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.sent = []
+        self.calls = 0
+
+    async def send(self, chat_id, text):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((time.monotonic(), chat_id, text))
+
+
+class RetryAfter(Exception):
+    retry_after = 0.05
+
+
+def run(sender, messages):
+    async def main():
+        sender.start()
+        for chat_id, text, coalesce in messages:
+            sender.enqueue(chat_id, text, coalesce)
+        await sender.stop()
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(2, capacity=2, clock=clock)
+    bucket.consume()
+    bucket.consume()
+    assert bucket.delay() == 0.5
+
+    clock.now = 0.25
+    assert bucket.delay() == 0.25
+    clock.now = 10
+    assert bucket.delay() == 0
+    assert bucket.tokens == 2
+
+
+def test_chat_rate_limit_does_not_delay_other_chats():
+    bot = FlakyBot()
+    sender = Sender(bot.send, chat_rate=10)
+    run(sender, [(1, "a", False), (1, "b", False), (1, "c", False), (2, "d", False)])
+
+    assert [text for _, _, text in bot.sent] == ["a", "d", "b", "c"]
+    times = [sent_time for sent_time, chat_id, _ in bot.sent if chat_id == 1]
+    assert times[1] - times[0] >= 0.09
+    assert times[2] - times[1] >= 0.09
+
+
+def test_chat_rate_limit_applies_to_messages_enqueued_after_the_queue_drained():
+    bot = FlakyBot()
+    sender = Sender(bot.send)
+
+    async def main():
+        sender.start()
+        for text in "abc":
+            sender.enqueue(1, text)
+            await asyncio.sleep(0.05)
+        await sender.stop()
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+    times = [sent_time for sent_time, _, _ in bot.sent]
+    assert [text for _, _, text in bot.sent] == ["a", "b", "c"]
+    assert times[1] - times[0] >= 0.95
+    assert times[2] - times[1] >= 0.95
+
+
+def test_global_rate_limit():
+    bot = FlakyBot()
+    sender = Sender(bot.send, global_rate=20, chat_rate=1000)
+    run(sender, [(chat_id, "x", False) for chat_id in range(30)])
+
+    assert len(bot.sent) == 30
+    # 20 сообщений сразу из полной корзины, ещё 10 — за полсекунды.
+    assert bot.sent[-1][0] - bot.sent[0][0] >= 0.45
+
+
+def test_due_reminders_are_coalesced():
+    bot = FlakyBot()
+    sender = Sender(bot.send, chat_rate=1000)
+    messages = [
+        (1, "Напоминаю: a", True),
+        (1, "Напоминаю: b", True),
+        (2, "Напоминаю: c", True),
+        (1, "ответ", False),
+        (1, "Напоминаю: d", True),
+    ]
+    run(sender, messages)
+
+    assert sorted((chat_id, text) for _, chat_id, text in bot.sent) == [
+        (1, "Напоминаю: a\nНапоминаю: b"),
+        (1, "Напоминаю: d"),
+        (1, "ответ"),
+        (2, "Напоминаю: c"),
+    ]
+    assert [text for _, chat_id, text in bot.sent if chat_id == 1][1:] == ["ответ", "Напоминаю: d"]
+    assert sender.stats()["sent"] == 4
+
+
+def test_coalesced_messages_stay_within_the_message_limit():
+    bot = FlakyBot()
+    sender = Sender(bot.send, chat_rate=1000)
+    tasks = [f"Напоминаю: {index} " + "я" * 1500 for index in range(6)]
+    run(sender, [(1, task, True) for task in tasks] + [(1, "Напоминаю: " + "ю" * 5000, True)])
+
+    texts = [text for _, _, text in bot.sent]
+    assert all(len(text) <= MAX_LENGTH for text in texts)
+    assert texts[:3] == ["\n".join(tasks[0:2]), "\n".join(tasks[2:4]), "\n".join(tasks[4:6])]
+    assert "".join(texts[3:]) == "Напоминаю: " + "ю" * 5000
+    assert len(texts) == 5
+
+
+def test_split_prefers_whitespace():
+    assert split("aaa bbb ccc", 8) == ["aaa bbb", "ccc"]
+    assert split("a" * 10, 4) == ["aaaa", "aaaa", "aa"]
+
+
+def test_failed_sends_are_retried_in_order():
+    bot = FlakyBot([ConnectionError(), RetryAfter()])
+    sender = Sender(bot.send, chat_rate=1000, backoff=0.01)
+    started = time.monotonic()
+    run(sender, [(1, "a", False), (1, "b", False)])
+
+    assert [text for _, _, text in bot.sent] == ["a", "b"]
+    assert bot.sent[0][0] - started >= 0.06
+    stats = sender.stats()
+    assert stats["retries"] == 2
+    assert stats["failed"] == 0
+    assert stats["queued"] == 0
+    assert stats["latency_max"] >= 0.06
+
+
+def test_gives_up_on_permanent_errors():
+    bot = FlakyBot([ValueError()] + [ConnectionError()] * 3)
+    sender = Sender(
+        bot.send,
+        chat_rate=1000,
+        backoff=0.001,
+        max_attempts=3,
+        retryable=lambda error: isinstance(error, ConnectionError),
+    )
+    run(sender, [(1, "a", False), (1, "b", False), (1, "c", False)])
+
+    assert [text for _, _, text in bot.sent] == ["c"]
+    assert bot.calls == 5
+    assert sender.stats()["failed"] == 2
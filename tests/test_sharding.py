@@ -0,0 +1,53 @@
+import datetime as dt
+import queue
+
+from scheduler import Reminder
+from sharding import HashRing, ShardedScheduler
+from storage import ReminderStore
+
+
+def test_ring_moves_about_one_nth_of_chats():
+    chats = range(10000)
+    two = HashRing([0, 1])
+    three = HashRing([0, 1, 2])
+
+    moved = [chat for chat in chats if two.shard_for(chat) != three.shard_for(chat)]
+    assert all(three.shard_for(chat) == 2 for chat in moved)
+    assert 0.25 < len(moved) / len(chats) < 0.42
+    assert HashRing([1, 0]).shard_for(12345) == two.shard_for(12345)
+
+
+def test_shards_fire_and_rebalance(tmp_path):
+    path_template = str(tmp_path / "shard{}.sqlite3")
+    fired = queue.Queue()
+    scheduler = ShardedScheduler(fired.put, path_template, shards=2)
+    scheduler.start()
+    try:
+        later = dt.datetime.utcnow() + dt.timedelta(days=1)
+        ids = [scheduler.add(Reminder(later, chat_id, f"чат {chat_id}")) for chat_id in range(60)]
+        assert {name for name, _ in ids} == {0, 1}
+
+        soon = dt.datetime.utcnow() + dt.timedelta(seconds=0.2)
+        scheduler.add(Reminder(soon, 7, "скоро"))
+        reminder = fired.get(timeout=5)
+        assert (reminder.chat_id, reminder.task) == (7, "скоро")
+
+        scheduler.cancel(ids[0])
+        assert scheduler.count() == 59
+
+        assert scheduler.add_shard() == 2
+        assert scheduler.count() == 59
+        counts = {name: scheduler._call(name, "count") for name in scheduler.shards}
+        assert all(counts.values())
+
+        scheduler.remove_shard(0)
+        assert scheduler.count() == 59
+    finally:
+        scheduler.stop()
+
+    # Каждый чат лежит в хранилище своего шарда по итоговому кольцу.
+    ring = HashRing([1, 2])
+    for name in (1, 2):
+        store = ReminderStore(path_template.format(name))
+        assert all(ring.shard_for(chat_id) == name for chat_id in store.chat_ids())
+        store.close()
@@ -0,0 +1,26 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import json, time
+started = time.perf_counter()
+import exact_time
+imported = time.perf_counter()
+lazy = exact_time.get_parser.cache_info().currsize == 0
+exact_time.extractor("позвонить завтра в 10")
+ready = time.perf_counter()
+print(json.dumps({"import": imported - started, "ready": ready - started, "lazy": lazy}))
+"""
+
+
+def test_startup_time():
+    output = subprocess.check_output([sys.executable, "-c", SCRIPT], cwd=ROOT)
+    timings = json.loads(output.decode())
+
+    assert timings["lazy"]
+    assert timings["import"] < 0.3
+    assert timings["ready"] < 0.8
@@ -0,0 +1,116 @@
+import datetime as dt
+import sqlite3
+import time
+
+from scheduler import Reminder, Scheduler
+from storage import ReminderStore
+from tests.test_scheduler import FakeClock
+
+moment = dt.datetime(2018, 1, 1, 12, 0)
+
+
+def test_store_persists_batched_writes(tmp_path):
+    path = str(tmp_path / "reminders.sqlite3")
+    store = ReminderStore(path, batch_size=10)
+    first = store.add(Reminder(moment + dt.timedelta(hours=2), 1, "позвонить"))
+    second = store.add(Reminder(moment + dt.timedelta(hours=1), 2, "написать"))
+    third = store.add(Reminder(moment + dt.timedelta(days=1), 1, "проснуться"))
+    store.remove(second.id)
+    assert store._pending
+    store.close()
+
+    store = ReminderStore(path)
+    assert store.due_before(moment + dt.timedelta(hours=3)) == [first]
+    assert store.for_chat(1) == [first, third]
+    assert store.add(Reminder(moment, 3, "")).id == third.id + 1
+    store.close()
+
+
+def test_store_uses_wal_and_indexes(tmp_path):
+    store = ReminderStore(str(tmp_path / "reminders.sqlite3"))
+    (mode,) = store.connection.execute("PRAGMA journal_mode").fetchone()
+    assert mode == "wal"
+
+    for sql in ("SELECT * FROM reminders WHERE due_time <= ? ORDER BY due_time, chat_id",
+                "SELECT * FROM reminders WHERE chat_id = ? ORDER BY due_time"):
+        plan = " ".join(row[-1] for row in store.connection.execute(f"EXPLAIN QUERY PLAN {sql}", [1]))
+        assert "USING INDEX" in plan and "TEMP B-TREE" not in plan
+    store.close()
+
+
+def test_scheduler_loads_only_near_future_from_store(tmp_path):
+    path = str(tmp_path / "reminders.sqlite3")
+    store = ReminderStore(path)
+    soon = store.add(Reminder(moment + dt.timedelta(minutes=10), 1, "скоро"))
+    later = store.add(Reminder(moment + dt.timedelta(hours=5), 1, "потом"))
+    store.close()
+
+    clock = FakeClock(moment)
+    fired = []
+    store = ReminderStore(path)
+    scheduler = Scheduler(fired.append, clock=clock, store=store)
+    assert scheduler.next_time() == soon.time
+    assert len(scheduler) == 1
+
+    added = scheduler.add(Reminder(moment + dt.timedelta(hours=6), 2, "ещё позже"))
+    assert len(scheduler) == 1
+
+    clock.advance(minutes=10)
+    assert scheduler.run_pending() == 1
+    clock.advance(hours=6)
+    assert scheduler.run_pending() == 2
+    assert [reminder.id for reminder in fired] == [soon.id, later.id, added]
+    assert store.count() == 0
+    store.close()
+
+
+def test_store_keeps_recurrence_rule(tmp_path):
+    store = ReminderStore(str(tmp_path / "reminders.sqlite3"))
+    rule = "DTSTART:20180101T120000\nRRULE:FREQ=DAILY;BYHOUR=9;BYMINUTE=0;BYSECOND=0"
+    reminder = store.add(Reminder(moment, 1, "зарядка", rule=rule))
+    assert store.for_chat(1) == [reminder]
+    store.close()
+
+
+def test_store_keeps_chat_timezones(tmp_path):
+    path = str(tmp_path / "reminders.sqlite3")
+    store = ReminderStore(path)
+    store.set_timezone(1, "Asia/Vladivostok")
+    reminder = store.add(Reminder(moment, 1, "зарядка", timezone="Asia/Vladivostok"))
+    assert store.get_timezone(1) == "Asia/Vladivostok"
+    assert store.get_timezone(2) is None
+    store.close()
+
+    store = ReminderStore(path)
+    assert store.get_timezone(1) == "Asia/Vladivostok"
+    assert store.for_chat(1) == [reminder]
+    store.close()
+
+
+def test_migration_converts_server_local_times_to_utc(tmp_path, monkeypatch):
+    path = str(tmp_path / "reminders.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE reminders (id INTEGER PRIMARY KEY, due_time TEXT NOT NULL, "
+        "chat_id INTEGER NOT NULL, task TEXT NOT NULL)"
+    )
+    connection.execute(
+        "INSERT INTO reminders VALUES (1, '2018-01-01 12:00:00.000000', 1, 'позвонить')"
+    )
+    connection.commit()
+    connection.close()
+
+    monkeypatch.setenv("TZ", "Europe/Moscow")
+    time.tzset()
+    try:
+        store = ReminderStore(path)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert store.for_chat(1) == [Reminder(moment - dt.timedelta(hours=3), 1, "позвонить", 1)]
+    store.close()
+
+    # Повторное открытие уже перенесённой базы времена не трогает.
+    store = ReminderStore(path)
+    assert store.for_chat(1)[0].time == moment - dt.timedelta(hours=3)
+    store.close()
@@ -90,11 +90,26 @@ cases = [
             ("позвонить через 20 минут", "через 20 минут", dt.datetime(2018, 1, 1, 12, 20)),
             ("через 20 минут позвонить", "через 20 минут", dt.datetime(2018, 1, 1, 12, 20)),
             ("через час подготовить отчет", "через час", dt.datetime(2018, 1, 1, 13, 0)),
-            # "проверить платеж через два дня",
+            (
+                "проверить платеж через два дня",
+                "через два дня",
+                dt.datetime(2018, 1, 3, 12, 0),
+            ),
+            ("через 2 недели", "через 2 недели", dt.datetime(2018, 1, 15, 12, 0)),
+            (
+                "через 3 месяца, 1 неделю и 1 день",
+                "через 3 месяца, 1 неделю и 1 день",
+                dt.datetime(2018, 4, 9, 12, 0),
+            ),
+            ("через 2 дня", "через 2 дня", dt.datetime(2018, 1, 3, 12, 0)),
+            (
+                "через 2 часа 20 минут позвонить",
+                "через 2 часа 20 минут",
+                dt.datetime(2018, 1, 1, 14, 20),
+            ),
+            ("Через 5 секунд убрать машину", "Через 5 секунд", dt.datetime(2018, 1, 1, 12, 0, 5)),
+            ("через месяц", "через месяц", dt.datetime(2018, 2, 1, 12, 0)),
             # "позвонить за два дня до конца месяца",
-            # "через 2 недели",
-            # "через 3 месяца, 1 неделю и 1 день",
-            # "через 2 дня",
             # "завтра",
         ],
     )
@@ -114,3 +129,87 @@ for test_time, cases in cases:
         assert case_time == extract.time_string
 
     globals()[f"test_cases_{test_time.isoformat()}"] = f
+
+
+@pytest.mark.parametrize(
+    "case, moment, expected",
+    [
+        ("в 4 вечера", dt.datetime(2018, 1, 1, 23, 59), dt.datetime(2018, 1, 2, 16, 0)),
+        ("в 17:00", dt.datetime(2018, 1, 1, 23, 59), dt.datetime(2018, 1, 2, 17, 0)),
+    ],
+)
+def test_past_times_late_in_the_day(case, moment, expected):
+    assert extractor(case, moment=moment).time == expected
+
+
+@pytest.mark.parametrize(
+    "case",
+    [
+        "31 февраля в 10",
+        "29 февраля в 10",
+        "двадцать девятого февраля в 10",
+        "31.04.2018 в 10",
+    ],
+)
+def test_impossible_dates_are_not_extracted(case):
+    # Без года дата приходится на 2019-й, он не високосный.
+    assert extractor(case, moment=dt.datetime(2018, 1, 1, 12, 0)) is None
+
+
+def test_leap_day_in_a_leap_year():
+    extract = extractor("29 февраля в 10", moment=dt.datetime(2019, 1, 1, 12, 0))
+    assert extract.time == dt.datetime(2020, 2, 29, 10, 0)
+
+
+def test_explicit_dates_in_the_past_are_flagged():
+    extract = extractor("17.04.2018 в 9", moment=dt.datetime(2018, 6, 1, 12, 0))
+    assert extract.time == dt.datetime(2018, 4, 17, 9, 0)
+    assert extract.past
+    assert not extractor("17.04.2018 в 9", moment=dt.datetime(2018, 4, 17, 8, 0)).past
+
+
+@pytest.mark.parametrize(
+    "case, time_string, expected",
+    [
+        ("позвонить в шесть", "в шесть", dt.datetime(2018, 1, 1, 18, 0)),
+        ("в одиннадцать часов утра", "в одиннадцать часов утра", dt.datetime(2018, 1, 2, 11, 0)),
+        ("в пятницу в час дня", "в пятницу в час дня", dt.datetime(2018, 1, 5, 13, 0)),
+        ("в двадцать два часа", "в двадцать два часа", dt.datetime(2018, 1, 1, 22, 0)),
+        ("созвон в шесть тридцать", "в шесть тридцать", dt.datetime(2018, 1, 1, 18, 30)),
+        ("обед в полвторого", "в полвторого", dt.datetime(2018, 1, 1, 13, 30)),
+        ("в пол 2го", "в пол 2го", dt.datetime(2018, 1, 1, 13, 30)),
+        ("в половине второго", "в половине второго", dt.datetime(2018, 1, 1, 13, 30)),
+        ("в пол первого ночи", "в пол первого ночи", dt.datetime(2018, 1, 2, 0, 30)),
+        ("в 10 минут второго", "в 10 минут второго", dt.datetime(2018, 1, 1, 13, 10)),
+        ("в четверть третьего", "в четверть третьего", dt.datetime(2018, 1, 1, 14, 15)),
+        ("седьмого мая в три утра", "седьмого мая в три утра", dt.datetime(2019, 5, 7, 3, 0)),
+        (
+            "двадцать пятого декабря в 10",
+            "двадцать пятого декабря в 10",
+            dt.datetime(2019, 12, 25, 10, 0),
+        ),
+        ("22го июня в 8 утра", "22го июня в 8 утра", dt.datetime(2019, 6, 22, 8, 0)),
+        ("через двадцать пять минут", "через двадцать пять минут", dt.datetime(2018, 1, 1, 12, 25)),
+    ],
+)
+def test_spelled_numbers(case, time_string, expected):
+    extract = extractor(case, moment=dt.datetime(2018, 1, 1, 12, 0))
+    assert (extract.time_string, extract.time) == (time_string, expected)
+
+
+@pytest.mark.parametrize(
+    "case, expected",
+    [
+        ("в двадцать четыре", dt.datetime(2018, 1, 2, 0, 0)),
+        ("в 24:00", dt.datetime(2018, 1, 2, 0, 0)),
+        ("завтра в 24", dt.datetime(2018, 1, 3, 0, 0)),
+        ("каждый день в 24", dt.datetime(2018, 1, 2, 0, 0)),
+        ("в двадцать четыре вечера", dt.datetime(2018, 1, 2, 0, 0)),
+    ],
+)
+def test_hour_24_is_midnight_at_the_end_of_the_day(case, expected):
+    assert extractor(case, moment=dt.datetime(2018, 1, 1, 12, 0)).time == expected
+
+
+def test_declined_number_words_are_not_times():
+    assert extractor("забрать посылку в одном магазине", moment=dt.datetime(2018, 1, 1)) is None
@@ -0,0 +1,50 @@
+import datetime as dt
+import random
+
+import pytest
+import pytz
+
+from scheduler import Reminder, next_occurrence
+from timezones import zone_table
+
+ZONES = ["Europe/Moscow", "Europe/Berlin", "America/New_York", "Asia/Kolkata", "UTC"]
+
+
+@pytest.mark.parametrize("name", ZONES)
+def test_matches_pytz(name):
+    rng = random.Random(0)
+    table = zone_table(name)
+    zone = pytz.timezone(name)
+    for _ in range(1000):
+        utc = dt.datetime(1990, 1, 1) + dt.timedelta(minutes=rng.randrange(40 * 365 * 24 * 60))
+        local = pytz.utc.localize(utc).astimezone(zone).replace(tzinfo=None)
+        assert table.from_utc(utc) == local
+
+        expected = zone.normalize(zone.localize(local)).astimezone(pytz.utc)
+        assert table.to_utc(local) == expected.replace(tzinfo=None)
+
+
+def test_dst_edges():
+    berlin = zone_table("Europe/Berlin")
+    # 25 марта 2018 часы перевели с 2:00 на 3:00, 28 октября — с 3:00 на 2:00.
+    assert berlin.to_utc(dt.datetime(2018, 3, 25, 2, 30)) == dt.datetime(2018, 3, 25, 1, 30)
+    assert berlin.to_utc(dt.datetime(2018, 10, 28, 2, 30)) == dt.datetime(2018, 10, 28, 1, 30)
+    assert berlin.from_utc(dt.datetime(2018, 10, 28, 0, 30)) == dt.datetime(2018, 10, 28, 2, 30)
+
+
+def test_unknown_zone():
+    with pytest.raises(pytz.UnknownTimeZoneError):
+        zone_table("Europe/Atlantis")
+
+
+def test_recurring_reminder_keeps_local_time_across_dst():
+    rule = "DTSTART:20180320T090000\nRRULE:FREQ=DAILY;BYHOUR=9;BYMINUTE=0;BYSECOND=0"
+    berlin = zone_table("Europe/Berlin")
+    reminder = Reminder(
+        berlin.to_utc(dt.datetime(2018, 3, 24, 9)), 1, "", rule=rule, timezone="Europe/Berlin"
+    )
+    assert reminder.time == dt.datetime(2018, 3, 24, 8)
+
+    time = next_occurrence(reminder, reminder.time)
+    assert time == dt.datetime(2018, 3, 25, 7)
+    assert berlin.from_utc(time) == dt.datetime(2018, 3, 25, 9)
@@ -0,0 +1,57 @@
+import pytest
+from yargy import Parser, rule
+from yargy.tokenizer import MorphTokenizer
+
+from exact_time import DAYS, TIMES_OF_DAY, get_parser
+from vocabulary import VocabularyTagger, vocabulary
+
+
+def tag(text):
+    parser = get_parser()
+    return [token.tag for token in parser.tagger(parser.tokenizer(text)) if hasattr(token, "tag")]
+
+
+def test_inflected_forms_are_annotated_with_their_word():
+    assert tag("в Пятницу днем, во вторник вечером") == [
+        {"DAYS": "пятница", "WEEKDAYS": "пятница"},
+        {"TIMES_OF_DAY": "днём", "FREQUENCIES": "день"},
+        {"DAYS": "вторник", "WEEKDAYS": "вторник"},
+        {"TIMES_OF_DAY": "вечером", "RECURRING_TIMES_OF_DAY": "вечером"},
+    ]
+
+
+def test_homonyms_of_vocabulary_words_are_not_annotated():
+    # «дела» — форма глагола «деть», повелительное наклонение которого «день».
+    assert tag("как дела") == []
+
+
+def test_rule_reads_the_vocabulary_word():
+    tokenizer = MorphTokenizer()
+    tagger = VocabularyTagger({"DAYS": DAYS}, tokenizer.morph.raw)
+    parser = Parser(rule(vocabulary("DAYS")), tokenizer=tokenizer, tagger=tagger)
+
+    match = parser.match("среду")
+    assert match.tokens[0].normalized == "среда"
+
+
+def test_unknown_vocabulary_is_rejected_when_parser_is_built():
+    tokenizer = MorphTokenizer()
+    tagger = VocabularyTagger({"TIMES_OF_DAY": TIMES_OF_DAY}, tokenizer.morph.raw)
+    with pytest.raises(ValueError):
+        Parser(rule(vocabulary("DAYS")), tokenizer=tokenizer, tagger=tagger)
+
+
+def test_phrases_are_merged_into_one_token():
+    parser = get_parser()
+    tokens = list(parser.tagger(parser.tokenizer("через двадцать пять минут")))
+
+    assert [token.value for token in tokens] == ["через", "двадцать пять", "минут"]
+    assert tokens[1].span == (6, 19)
+    assert tokens[1].tag["NUMBER_WORDS"] == "двадцать пять"
+
+
+def test_verbatim_vocabularies_are_not_inflected():
+    assert tag("в шесть") == [
+        {"NUMBER_WORDS": "шесть", "CLOCK_HOURS": "шесть", "CLOCK_MINUTES": "шесть"}
+    ]
+    assert tag("в шести") == [{"NUMBER_WORDS": "шесть"}]
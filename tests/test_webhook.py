@@ -0,0 +1,73 @@
+import asyncio
+import http.client
+import json
+
+from runtime import Runtime
+from tests.test_runtime import Message, Update
+from webhook import WebhookServer
+
+# Обновления в том виде, в каком их присылает Bot API.
+recorded_updates = [
+    {
+        "update_id": 1,
+        "message": {
+            "message_id": 10,
+            "date": 1514808000,
+            "chat": {"id": 42, "type": "private"},
+            "text": "позвонить через 20 минут",
+        },
+    },
+    {
+        "update_id": 2,
+        "message": {
+            "message_id": 11,
+            "date": 1514808001,
+            "chat": {"id": 42, "type": "private"},
+            "text": "/start",
+        },
+    },
+]
+
+
+def decode(data):
+    message = data["message"]
+    return Update(data["update_id"], Message(message["chat"]["id"], message["text"]))
+
+
+def post(port, path, bodies):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    statuses = []
+    for body in bodies:
+        connection.request("POST", path, body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        statuses.append(response.status)
+    connection.close()
+    return statuses
+
+
+def test_webhook_hands_updates_to_runtime():
+    handled = []
+
+    async def handler(runtime, update):
+        handled.append(update)
+
+    runtime = Runtime(None, lambda update: handler)
+    server = WebhookServer(runtime, decode, path="/secret", host="127.0.0.1", port=0)
+
+    async def main():
+        await runtime.start()
+        await server.start()
+        bodies = [json.dumps(update) for update in recorded_updates] + ["not json", "{}", "[]"]
+        statuses = await runtime.loop.run_in_executor(None, post, server.port, "/secret", bodies)
+        wrong_path = await runtime.loop.run_in_executor(None, post, server.port, "/", ["{}"])
+        await runtime.join()
+        await server.stop()
+        await runtime.shutdown()
+        return statuses, wrong_path
+
+    statuses, wrong_path = asyncio.get_event_loop().run_until_complete(main())
+
+    assert statuses == [200, 200, 400, 400, 400]
+    assert wrong_path == [404]
+    assert handled == [decode(update) for update in recorded_updates]
@@ -0,0 +1,52 @@
+import bisect
+import datetime as dt
+import functools
+
+import pytz
+
+DEFAULT_TIMEZONE = "Europe/Moscow"
+
+
+class ZoneTable:
+    """UTC offsets of a timezone as sorted transition tables.
+
+    Built once per zone from pytz's transition data; converting a naive
+    datetime between UTC and local time is then a single bisect, instead of
+    pytz's localize() and normalize(). All datetimes are naive.
+
+    Ambiguous local times (when clocks go back) resolve to the later, standard
+    time, as pytz does by default. Nonexistent ones (when clocks go forward)
+    are shifted forward by the gap.
+    """
+
+    def __init__(self, zone):
+        self.name = zone.zone
+        transitions = getattr(zone, "_utc_transition_times", None)
+        if transitions:
+            self.offsets = [utcoffset for utcoffset, _, _ in zone._transition_info]
+            self.utc_starts = list(transitions)
+        else:
+            # Зона без переходов (UTC, Etc/GMT-3): одно смещение на все времена.
+            self.offsets = [zone.utcoffset(dt.datetime(2000, 1, 1))]
+            self.utc_starts = [dt.datetime.min]
+        self.local_starts = [
+            start if start == dt.datetime.min else start + offset
+            for start, offset in zip(self.utc_starts, self.offsets)
+        ]
+
+    def __repr__(self):
+        return f"ZoneTable({self.name!r})"
+
+    def from_utc(self, moment):
+        index = bisect.bisect_right(self.utc_starts, moment) - 1
+        return moment + self.offsets[max(index, 0)]
+
+    def to_utc(self, moment):
+        index = bisect.bisect_right(self.local_starts, moment) - 1
+        return moment - self.offsets[max(index, 0)]
+
+
+@functools.lru_cache(maxsize=None)
+def zone_table(name=DEFAULT_TIMEZONE) -> ZoneTable:
+    """Return the table for an IANA zone name; raises pytz.UnknownTimeZoneError."""
+    return ZoneTable(pytz.timezone(name))
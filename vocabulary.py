@@ -0,0 +1,132 @@
+import itertools
+
+from yargy.morph import Form, Grams
+from yargy.predicates.constructors import ParameterPredicate, ParameterPredicateScheme
+from yargy.span import Span
+from yargy.tagger import Tagger
+from yargy.token import MorphToken, is_tag_token
+
+
+def normalize(word):
+    return word.lower().replace("ё", "е")
+
+
+def inflections(word, morph) -> set:
+    # Только лексемы, нормальная форма которых — само слово: «день» — ещё и
+    # повелительное наклонение «деть», но «дела» не время суток.
+    forms = {word}
+    for parsed in morph.parse(word):
+        if parsed.normal_form == word:
+            forms.update(form.word for form in parsed.lexeme)
+    return {normalize(form) for form in forms}
+
+
+def inflection_table(words, morph) -> dict:
+    """Map every form of words to its word; morph is a pymorphy2 MorphAnalyzer.
+
+    Phrases such as "двадцать пять" are inflected word by word.
+    """
+    table = {normalize(word): word for word in words}
+    for word in words:
+        parts = [inflections(part, morph) for part in word.split()]
+        for phrase in itertools.product(*parts):
+            table.setdefault(" ".join(phrase), word)
+    return table
+
+
+class VocabularyTagger(Tagger):
+    """Annotates the tokens that belong to named vocabularies.
+
+    The forms of all vocabularies are compiled into a single table when the
+    parser is built, so a message costs one lookup per token however large the
+    vocabularies grow. A hit becomes the token's tag, {vocabulary name: word},
+    which the vocabulary() predicate reads instead of comparing the token's
+    morphological parses with the words.
+
+    Words of several tokens ("двадцать пять") are matched longest first and
+    merged into one token. Vocabularies named in verbatim are matched only in
+    the forms given, not inflected.
+    """
+
+    def __init__(self, vocabularies, morph, verbatim=()):
+        self.tags = sorted(vocabularies)
+        self.table = {}
+        for name, words in vocabularies.items():
+            if name in verbatim:
+                forms = {normalize(word): word for word in words}
+            else:
+                forms = inflection_table(words, morph)
+            for form, word in forms.items():
+                self.table.setdefault(form, {})[name] = word
+
+        # Начала составных слов: по ним сканирование решает, смотреть ли дальше.
+        self.prefixes = set()
+        for form in self.table:
+            words = form.split()
+            for stop in range(1, len(words)):
+                self.prefixes.add(" ".join(words[:stop]))
+
+    def __call__(self, tokens):
+        tokens = list(tokens)
+        start = 0
+        while start < len(tokens):
+            stop, annotations = self.match(tokens, start)
+            if annotations is None:
+                yield tokens[start]
+            else:
+                yield merge(tokens[start:stop]).tagged(annotations)
+            start = stop
+
+    def match(self, tokens, start):
+        """Return the end of the longest vocabulary phrase at start and its annotations."""
+        phrase = normalize(tokens[start].value)
+        stop, annotations = start + 1, self.table.get(phrase)
+        for index in range(start + 1, len(tokens)):
+            if phrase not in self.prefixes:
+                break
+            phrase += " " + normalize(tokens[index].value)
+            if phrase in self.table:
+                stop, annotations = index + 1, self.table[phrase]
+        return stop, annotations
+
+    def forms(self, *names) -> set:
+        """Return the forms that belong to any of the named vocabularies."""
+        return {
+            form
+            for form, annotations in self.table.items()
+            if not annotations.keys().isdisjoint(names)
+        }
+
+
+def merge(tokens):
+    if len(tokens) == 1:
+        return tokens[0]
+    first, last = tokens[0], tokens[-1]
+    return MorphToken(
+        " ".join(token.value for token in tokens),
+        Span(first.span.start, last.span.stop),
+        first.type,
+        last.forms,
+    )
+
+
+class vocabulary(ParameterPredicateScheme):
+    """Token was annotated with vocabulary value by VocabularyTagger."""
+
+    def activate(self, context):
+        if not context.tagger.check_tag(self.value):
+            raise ValueError(self.value)
+        return VocabularyPredicate(self.value)
+
+
+class VocabularyPredicate(ParameterPredicate):
+    def __call__(self, token):
+        return is_tag_token(token) and self.value in token.tag
+
+    def constrain(self, token):
+        # normalized() в интерпретации даёт слово словаря, а не первый разбор pymorphy2.
+        return token.constrained([Form(token.tag[self.value], Grams(frozenset()))])
+
+    @property
+    def label(self):
+        return f"vocabulary({self.value!r})"
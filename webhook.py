@@ -0,0 +1,112 @@
+import asyncio
+import json
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+Response = namedtuple("Response", "status, body, content_type")
+Response.__new__.__defaults__ = (b"{}", "application/json")
+
+
+class HTTPServer:
+    """Minimal asyncio HTTP/1.1 server with keep-alive.
+
+    Subclasses implement handle_request(method, target, body) -> Response.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+
+                response = await self.handle_request(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.write_response(writer, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, method, target, body) -> Response:
+        raise NotImplementedError
+
+    async def read_request(self, reader):
+        line = await reader.readline()
+        if not line.strip():
+            return
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, target, headers, body
+
+    def write_response(self, writer, response, keep_alive):
+        connection = "keep-alive" if keep_alive else "close"
+        writer.write(
+            f"HTTP/1.1 {response.status} {REASONS[response.status]}\r\n"
+            f"Content-Type: {response.content_type}\r\n"
+            f"Content-Length: {len(response.body)}\r\n"
+            f"Connection: {connection}\r\n"
+            "\r\n".encode()
+            + response.body
+        )
+
+
+class WebhookServer(HTTPServer):
+    """Minimal HTTP/1.1 endpoint for Bot API webhook updates.
+
+    Each POST to path carries one update as JSON; it is decoded, queued on the
+    runtime and acknowledged right away, handling happens in the runtime's
+    workers. Connections are kept alive, as Telegram reuses them.
+    """
+
+    def __init__(self, runtime, decode, path="/", host="0.0.0.0", port=8443):
+        super().__init__(host, port)
+        self.runtime = runtime
+        self.decode = decode
+        self.path = path
+
+    async def handle_request(self, method, target, body) -> Response:
+        if target.split("?", 1)[0] != self.path:
+            return Response(404)
+        if method != "POST":
+            return Response(405)
+
+        # Не только невалидный JSON: {} или [] ломают decode KeyError или TypeError.
+        try:
+            update = self.decode(json.loads(body.decode()))
+        except Exception:
+            logger.warning("Invalid webhook update: %r", body[:200], exc_info=True)
+            return Response(400)
+
+        await self.runtime.dispatch(update)
+        return Response(200)